@@ -24,7 +24,7 @@ from schemas.chat import (
 )
 from services.chat_service import ChatService
 from services.rag_service import RAGService
-from services.embedding_service import EmbeddingService
+from services.embedding_service import get_embedding_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -247,10 +247,10 @@ async def send_message(
         # Utiliser l'utilisateur fictif
         current_user = get_or_create_fake_user(db)
         
-        # Initialiser les services
-        embedding_service = EmbeddingService()
-        await embedding_service.initialize()
-        
+        # Initialiser les services (instance d'embeddings partagée: l'index
+        # BM25 et la matrice du corpus survivent d'une requête à l'autre)
+        embedding_service = await get_embedding_service()
+
         rag_service = RAGService(embedding_service)
         await rag_service.initialize()
         
@@ -361,9 +361,8 @@ async def send_message_stream(
             }
             yield f"data: {json.dumps(init_data, ensure_ascii=False)}\n\n"
             
-            embedding_service = EmbeddingService()
-            await embedding_service.initialize()
-            
+            embedding_service = await get_embedding_service()
+
             rag_service = RAGService(embedding_service)
             await rag_service.initialize()
             
@@ -20,7 +20,7 @@ from schemas.document import (
     DocumentStatusResponse
 )
 from services.document_service import DocumentService
-from services.embedding_service import EmbeddingService
+from services.embedding_service import get_embedding_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -238,9 +238,10 @@ async def upload_document(
         
         # Process document
         try:
-            embedding_service = EmbeddingService()
-            await embedding_service.initialize()
-            
+            # Instance partagée: le batcher d'embeddings peut ainsi
+            # regrouper les encodages de plusieurs uploads concurrents
+            embedding_service = await get_embedding_service()
+
             document_service = DocumentService(db, embedding_service)
             
             tags_list = [tag.strip() for tag in tags.split(",")] if tags else None
@@ -261,9 +262,7 @@ async def upload_document(
                 )
             
             document = document_service.get_document(result.document_id, FAKE_USER_ID)
-            
-            await embedding_service.cleanup()
-            
+
             logger.info(f"Document uploadé avec succès: {document.id}")
             
             return DocumentResponse(
@@ -456,7 +455,7 @@ async def delete_document(
         
         document_service = DocumentService(db)
         
-        if not document_service.delete_document(document_id, FAKE_USER_ID):
+        if not await document_service.delete_document(document_id, FAKE_USER_ID):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Document non trouvé"
@@ -490,11 +489,22 @@ async def get_documents_stats(
         logger.info(f"Getting document stats for fake user {FAKE_USER_ID}")
         
         document_service = DocumentService(db)
-        stats = document_service.get_document_stats(FAKE_USER_ID)
-        
+        # Une seule passe service: stats + documents récents dans la même
+        # transaction au lieu de deux appels séparés
+        stats, recent_documents = document_service.get_overview(FAKE_USER_ID, limit=10)
+
         # Add additional stats for frontend
         enhanced_stats = {
             **stats,
+            "recent_documents": [
+                {
+                    "id": doc.id,
+                    "original_filename": doc.original_filename,
+                    "embeddings_status": doc.embeddings_status.value if hasattr(doc.embeddings_status, 'value') else str(doc.embeddings_status),
+                    "created_at": doc.created_at.isoformat() if doc.created_at else None
+                }
+                for doc in recent_documents
+            ],
             "upload_enabled": True,
             "supported_formats": list(ALLOWED_EXTENSIONS),
             "max_file_size_mb": getattr(settings, 'MAX_FILE_SIZE', 10*1024*1024) // (1024*1024)
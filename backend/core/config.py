@@ -106,6 +106,21 @@ class Settings(BaseSettings):
     EMBEDDING_BATCH_SIZE: int = 32
     EMBEDDING_DEVICE: str = Field(default="cpu", json_schema_extra={'env': 'EMBEDDING_DEVICE'})
     EMBEDDING_NORMALIZE: bool = True
+    # Threads intra-op torch pour encode (0 = tous les coeurs)
+    EMBEDDING_NUM_THREADS: int = Field(default=0, json_schema_extra={'env': 'EMBEDDING_NUM_THREADS'})
+    # Backend d'inférence sentence-transformers: "torch" ou "onnx"
+    # (onnx: graphe fusionné par ONNX Runtime, ~3-4x plus rapide sur CPU)
+    EMBEDDING_BACKEND: str = Field(default="torch", json_schema_extra={'env': 'EMBEDDING_BACKEND'})
+    # Fichier ONNX à charger avec le backend onnx (ex: export quantizé int8
+    # "onnx/model_qint8_avx512_vnni.onnx"; vide = export FP32 par défaut)
+    EMBEDDING_ONNX_FILE: str = Field(default="", json_schema_extra={'env': 'EMBEDDING_ONNX_FILE'})
+    # Quantization des vecteurs persistés: "none" ou "int8"
+    EMBED_QUANTIZATION: str = Field(default="none", json_schema_extra={'env': 'EMBED_QUANTIZATION'})
+    # Cross-encoder de re-ranking, opt-in (chaîne vide = heuristique
+    # historique; ex: "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANKER_MODEL: str = Field(default="", json_schema_extra={'env': 'RERANKER_MODEL'})
+    # Nombre de candidats passés au cross-encoder
+    RERANK_TOP_N: int = Field(default=25, json_schema_extra={'env': 'RERANK_TOP_N'})
     
     # Configuration ChromaDB
     CHROMADB_HOST: str = "localhost"
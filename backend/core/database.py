@@ -10,6 +10,13 @@ from alembic.config import Config
 
 from core.config import settings
 
+# orjson (optionnel): sérialisation JSON 3-10x plus rapide que le module
+# standard pour les colonnes JSON/JSONB (metadata des chunks notamment)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Force utf-8 on Windows - amélioré
 if sys.platform.startswith('win'):
     os.environ['PYTHONIOENCODING'] = 'utf-8'
@@ -82,6 +89,12 @@ class DatabaseManager:
             }
         }
 
+        # Brancher orjson sur l'engine si disponible: transparent pour les
+        # modèles, tout INSERT/SELECT de colonne JSON en profite
+        if orjson is not None:
+            engine_kwargs["json_serializer"] = lambda v: orjson.dumps(v).decode()
+            engine_kwargs["json_deserializer"] = orjson.loads
+
         try:
             self.engine = create_engine(database_url, **engine_kwargs)
             
@@ -25,7 +25,7 @@ from core.database import init_db, close_db, get_db
 from api.v1.api import api_router
 from services.chat_service import ChatService
 from services.rag_service import RAGService
-from services.embedding_service import EmbeddingService
+from services.embedding_service import get_embedding_service, cleanup_embedding_service
 from services.document_service import DocumentService
 from utils.logging import setup_logging
 from schemas.chat import ChatRequest, ChatResponse
@@ -92,11 +92,11 @@ async def lifespan(app: FastAPI):
         
         logger.info("🤖 Initializing services...")
         
-        # Initialiser les services dans l'ordre correct
+        # Initialiser les services dans l'ordre correct (instance
+        # d'embeddings partagée avec les endpoints via get_embedding_service)
         try:
-            embedding_service = EmbeddingService()
             logger.info("🔧 Initializing EmbeddingService...")
-            await embedding_service.initialize()
+            embedding_service = await get_embedding_service()
             logger.info("✅ EmbeddingService initialized successfully")
         except Exception as e:
             logger.error(f"❌ Failed to initialize EmbeddingService: {e}")
@@ -139,8 +139,12 @@ async def lifespan(app: FastAPI):
         if hasattr(app.state, 'rag_service'):
             await app.state.rag_service.cleanup()
             
-        if hasattr(app.state, 'embedding_service'):
-            await app.state.embedding_service.cleanup()
+        # Fermer l'instance d'embeddings partagée
+        await cleanup_embedding_service()
+
+        # Fermer la session OpenRouter partagée
+        from services.openrouter_service import cleanup_openrouter_service
+        await cleanup_openrouter_service()
         
         close_db()
         
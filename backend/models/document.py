@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum, JSON, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum, JSON, Float, Index, desc
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -28,6 +29,12 @@ class DocumentType(str, enum.Enum):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Pagination de get_documents: range scan ordonné au lieu de filtre + tri
+        Index("ix_document_user_created", "uploaded_by", desc("created_at")),
+        # Filtres par statut de get_documents / agrégation de get_document_stats
+        Index("ix_document_user_status", "uploaded_by", "embeddings_status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False, index=True)
@@ -35,6 +42,7 @@ class Document(Base):
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer, nullable=False)
     file_hash = Column(String(64), nullable=False, unique=True, index=True)
+    fast_hash = Column(String(64), nullable=True, index=True)
     content = Column(Text, nullable=True) 
     document_type = Column(Enum(DocumentType), nullable=False)
     mime_type = Column(String(100), nullable=False)
@@ -73,10 +81,13 @@ class Document(Base):
     version = Column(Integer, default=1)
     parent_document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
     
-    metad = Column(JSON, nullable=True)
+    # JSONB sous Postgres: stockage binaire, encodage/décodage plus rapide
+    metad = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)
     
     uploaded_by_user = relationship("User", back_populates="uploaded_documents")
-    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan")
+    # passive_deletes: la cascade est déléguée à la base (ON DELETE CASCADE),
+    # l'ORM ne charge plus les chunks pour les supprimer un à un
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan", passive_deletes=True)
     parent_document = relationship("Document", remote_side=[id])
     child_documents = relationship("Document", back_populates="parent_document")
     
@@ -178,7 +189,7 @@ class DocumentChunk(Base):
     __tablename__ = "document_chunks"
 
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
     
     content = Column(Text, nullable=False)
     chunk_index = Column(Integer, nullable=False)
@@ -203,7 +214,7 @@ class DocumentChunk(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
-    metad = Column(JSON, nullable=True)
+    metad = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)
     
     document = relationship("Document", back_populates="chunks")
     
@@ -1,34 +1,30 @@
 import os
 import hashlib
 import mimetypes
+import mmap
+import sys
+import time
 from typing import List, Dict, Optional, Tuple, Any
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
 import re
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
-import PyPDF2
-import docx
-import chardet
+import importlib.util
+
+import numpy as np
 from pydantic import BaseModel
 
-# Ajout d'imports pour une meilleure extraction PDF
-try:
-    import fitz  # PyMuPDF - plus robuste
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
-    
-try:
-    import pdfplumber  # Alternative pour les tableaux
-    PDFPLUMBER_AVAILABLE = True
-except ImportError:
-    PDFPLUMBER_AVAILABLE = False
+# Les bibliothèques d'extraction (PyPDF2, docx, fitz, pdfplumber, chardet) sont
+# lourdes: on ne vérifie ici que leur disponibilité, l'import réel est différé
+# dans les méthodes d'extraction pour réduire la mémoire au démarrage
+PYMUPDF_AVAILABLE = importlib.util.find_spec("fitz") is not None
+PDFPLUMBER_AVAILABLE = importlib.util.find_spec("pdfplumber") is not None
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, func, delete
 
 from models.document import Document, DocumentChunk, DocumentType, EmbeddingStatus
 from core.config import settings
@@ -38,6 +34,28 @@ from services.embedding_service import EmbeddingService
 
 logger = logging.getLogger(__name__)
 
+# Validation de nom en une seule passe regex: 3-50 caractères, 2 à 4 mots,
+# chaque mot commençant par une majuscule, sans chiffres ni symboles
+_NAME_OK_RE = re.compile(
+    r"^(?=.{3,50}$)[A-ZÀ-Ÿ][a-zà-ÿ\-']+(?:\s+[A-ZÀ-Ÿ][a-zà-ÿ\-']+){1,3}$"
+)
+
+# Mots qui indiquent que la ligne n'est pas un nom de personne
+_FORBIDDEN_NAME_WORDS = frozenset([
+    'curriculum', 'vitae', 'resume', 'contact', 'formation',
+    'education', 'experience', 'competence', 'skill', 'projet',
+    'stage', 'telephone', 'email', 'adresse', 'date'
+])
+
+# Gate rapide: ne lancer l'extraction d'informations personnelles que si le
+# début du document ressemble à un CV (évite ~20 scans regex sur le contenu
+# complet pour les documents non-CV)
+_CV_GATE_RE = re.compile(
+    r"\b(CV|Curriculum\s+Vitae|Resume|Formation|Exp[ée]rience|Comp[ée]tences)\b"
+    r"|\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b",
+    re.IGNORECASE
+)
+
 
 class DocumentMetadata(BaseModel):
     filename: str
@@ -48,7 +66,8 @@ class DocumentMetadata(BaseModel):
     page_count: Optional[int] = None
     word_count: Optional[int] = None
     language: Optional[str] = None
-    checksum: str
+    checksum: Optional[str] = None
+    fast_hash: Optional[str] = None
     created_at: datetime
     processed_at: Optional[datetime] = None
 
@@ -58,6 +77,7 @@ class DocumentChunkData(BaseModel):
     chunk_index: int
     start_position: int
     end_position: int
+    word_count: int = 0
     metadata: Dict[str, Any]
 
 
@@ -70,7 +90,35 @@ class DocumentProcessingResult(BaseModel):
     metadata: Optional[DocumentMetadata] = None
 
 
-class DocumentService:    
+# Table de translation: chaque terminateur de phrase devient un octet sentinelle,
+# ce qui permet une découpe en phrases par simple scan C (translate + split)
+_SENT_TRANS_TABLE = str.maketrans({'.': '\x01', '!': '\x01', '?': '\x01'})
+
+# Itération sur les mots sans matérialiser la liste complète (cf. chunking simple)
+_WORD_RE = re.compile(r"\S+")
+
+def _count_words(s: str) -> int:
+    """Compter les mots sans matérialiser la liste de str.split().
+
+    Même résultat que len(s.split()) mais en O(1) mémoire: finditer évite
+    d'allouer un petit objet str par mot juste pour les compter.
+    """
+    return sum(1 for _ in _WORD_RE.finditer(s))
+
+
+# Taille des lots d'INSERT de chunks (borne la mémoire des dicts de lignes)
+_CHUNK_INSERT_BATCH = 500
+
+# Correspondance extension -> type de document, construite une seule fois
+_EXT_TO_TYPE = {
+    '.pdf': DocumentType.PDF,
+    '.docx': DocumentType.DOCX,
+    '.txt': DocumentType.TXT,
+    '.md': DocumentType.MD
+}
+
+
+class DocumentService:
     def __init__(self, db: Session, embedding_service: EmbeddingService = None):
         self.db = db
         self.embedding_service = embedding_service
@@ -80,6 +128,9 @@ class DocumentService:
         
         self.chunk_size = getattr(settings, 'RAG_CHUNK_SIZE', 1000)
         self.chunk_overlap = getattr(settings, 'RAG_CHUNK_OVERLAP', 200)
+
+        # Préfixes de contexte déjà construits, par (nom, école, spécialité)
+        self._prefix_cache: Dict[Tuple[str, str, str], str] = {}
         
         self.supported_formats = {
             '.pdf': self._extract_pdf_content,
@@ -96,7 +147,7 @@ class DocumentService:
         tags: Optional[List[str]] = None
     ) -> DocumentProcessingResult:
         """Traiter un document et l'indexer"""
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         metadata = None
         
         try:
@@ -107,8 +158,8 @@ class DocumentService:
             # Extraction des métadonnées
             metadata = await self._extract_metadata(file_path)
             
-            # Vérification des doublons
-            existing_doc = self._check_duplicate(metadata.checksum)
+            # Vérification des doublons (rejet rapide par hash de préfixe)
+            existing_doc = await self._check_duplicate(metadata, file_path)
             if existing_doc:
                 logger.warning(f"Document déjà existant: {metadata.filename}")
                 return DocumentProcessingResult(
@@ -129,13 +180,13 @@ class DocumentService:
             # Chunking amélioré avec extraction d'informations personnelles
             chunks = await self._chunk_text_with_personal_info(cleaned_content, metadata)
             
-            # Création du document en base
-            document = await self._create_document(
-                file_path, metadata, user_id, category, tags, len(chunks)
-            )
-            
-            # Sauvegarde des chunks
-            await self._save_chunks(document.id, chunks)
+            # Création du document et des chunks dans une même section
+            # transactionnelle: un seul flush, un seul commit à la fin
+            with self.db.begin_nested():
+                document = await self._create_document(
+                    file_path, metadata, user_id, category, tags, len(chunks)
+                )
+                await self._save_chunks(document.id, chunks)
             
             # ✅ CORRECTION: Générer les embeddings IMMÉDIATEMENT après la sauvegarde
             # sans nettoyer le service d'embeddings
@@ -151,9 +202,9 @@ class DocumentService:
             
             # Commit final
             self.db.commit()
-            
-            processing_time = (datetime.now() - start_time).total_seconds()
-            
+
+            processing_time = time.perf_counter() - start_time
+
             return DocumentProcessingResult(
                 document_id=document.id,
                 success=True,
@@ -165,7 +216,7 @@ class DocumentService:
         except Exception as e:
             logger.error(f"Erreur lors du traitement du document {file_path}: {str(e)}")
             self.db.rollback()
-            processing_time = (datetime.now() - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             
             return DocumentProcessingResult(
                 document_id=0,
@@ -220,9 +271,11 @@ class DocumentService:
             successful_embeddings = 0
             for chunk_data in chunks:
                 try:
+                    # Le préfixe partagé n'est recollé qu'au moment de l'embed
+                    context_prefix = chunk_data.metadata.get("context_prefix", "")
                     await self.embedding_service.index_document(
                         document_id=str(document_id),
-                        content=chunk_data.content,
+                        content=context_prefix + chunk_data.content,
                         metadata={
                             "document_id": document_id,
                             "source_file": document.filename,
@@ -291,7 +344,9 @@ class DocumentService:
             path = Path(file_path)
             stat = path.stat()
             
-            checksum = await self._calculate_checksum(file_path)
+            # Hash de préfixe bon marché; le checksum complet n'est calculé
+            # que si un candidat doublon existe (voir _check_duplicate)
+            fast_hash = await self._calculate_fast_hash(file_path)
             mime_type, _ = mimetypes.guess_type(file_path)
             
             encoding = None
@@ -304,7 +359,7 @@ class DocumentService:
                 file_type=path.suffix.lower(),
                 mime_type=mime_type or "application/octet-stream",
                 encoding=encoding,
-                checksum=checksum,
+                fast_hash=fast_hash,
                 created_at=datetime.fromtimestamp(stat.st_ctime)
             )
         except Exception as e:
@@ -316,8 +371,17 @@ class DocumentService:
         def _hash_file():
             hash_md5 = hashlib.md5()
             with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
+                try:
+                    # mmap: le hash lit directement les pages du cache disque,
+                    # sans copie intermédiaire dans des bytes Python
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if hasattr(mm, 'madvise'):
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                        hash_md5.update(mm)
+                except (ValueError, OSError):
+                    # Fichier vide ou mmap indisponible: lecture classique
+                    for chunk in iter(lambda: f.read(65536), b""):
+                        hash_md5.update(chunk)
             return hash_md5.hexdigest()
         
         try:
@@ -327,12 +391,30 @@ class DocumentService:
             logger.error(f"Erreur calcul checksum: {str(e)}")
             raise
 
+    async def _calculate_fast_hash(self, file_path: str) -> str:
+        """Calculer un hash rapide des premiers 64 Ko d'un fichier"""
+        def _hash_prefix():
+            with open(file_path, "rb") as f:
+                return hashlib.blake2b(f.read(65536), digest_size=32).hexdigest()
+
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.executor, _hash_prefix)
+        except Exception as e:
+            logger.error(f"Erreur calcul fast hash: {str(e)}")
+            raise
+
     async def _detect_encoding(self, file_path: str) -> str:
         """Détecter l'encodage d'un fichier texte"""
         def _detect():
+            import chardet
+
             with open(file_path, 'rb') as f:
-                raw_data = f.read(10000)
-                result = chardet.detect(raw_data)
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        result = chardet.detect(mm[:10000])
+                except (ValueError, OSError):
+                    result = chardet.detect(f.read(10000))
                 return result['encoding'] or "utf-8"
         
         try:
@@ -362,6 +444,8 @@ class DocumentService:
         # Méthode 1: PyMuPDF (fitz) - plus robuste pour les noms et caractères spéciaux
         if PYMUPDF_AVAILABLE:
             try:
+                import fitz  # PyMuPDF - import différé
+
                 doc = fitz.open(file_path)
                 for page_num in range(len(doc)):
                     page = doc.load_page(page_num)
@@ -402,6 +486,8 @@ class DocumentService:
         
         # Méthode 3: PyPDF2 (fallback final)
         try:
+            import PyPDF2
+
             content = []
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
@@ -426,6 +512,8 @@ class DocumentService:
     def _extract_docx_content(self, file_path: str) -> str:
         """Extraire le contenu d'un DOCX"""
         try:
+            import docx  # import différé
+
             doc = docx.Document(file_path)
             content = []
             
@@ -455,6 +543,8 @@ class DocumentService:
     def _extract_txt_content(self, file_path: str) -> str:
         """Extraire le contenu d'un fichier texte"""
         try:
+            import chardet
+
             # Détecter l'encodage
             with open(file_path, 'rb') as f:
                 raw_data = f.read()
@@ -574,41 +664,10 @@ class DocumentService:
 
     def _is_valid_name(self, name: str) -> bool:
         """Valider qu'une chaîne est bien un nom de personne"""
-        if not name or len(name) < 3:
-            return False
-        
-        # Doit contenir au moins un espace (prénom + nom)
-        if ' ' not in name:
-            return False
-        
-        # Ne doit pas être trop long
-        if len(name) > 50:
+        if not name or not _NAME_OK_RE.match(name):
             return False
-        
-        # Ne doit pas contenir de chiffres ou symboles bizarres
-        if re.search(r'[0-9@#$%^&*()_+=\[\]{}|\\:";\'<>?,./]', name):
-            return False
-        
-        # Ne doit pas être une phrase complète
-        words = name.split()
-        if len(words) > 4:  # Maximum 4 mots pour un nom
-            return False
-        
-        # Chaque mot doit commencer par une majuscule
-        for word in words:
-            if not word[0].isupper():
-                return False
-        
-        # Mots interdits qui indiquent que ce n'est pas un nom
-        forbidden_words = ['curriculum', 'vitae', 'resume', 'contact', 'formation', 
-                          'education', 'experience', 'competence', 'skill', 'projet',
-                          'stage', 'telephone', 'email', 'adresse', 'date']
-        
-        for word in words:
-            if word.lower() in forbidden_words:
-                return False
-        
-        return True
+
+        return not any(word.lower() in _FORBIDDEN_NAME_WORDS for word in name.split())
 
     async def _preprocess_text(self, content: str) -> str:
         """Prétraiter le texte"""
@@ -632,9 +691,16 @@ class DocumentService:
         """Chunking amélioré qui préserve les informations personnelles - AMÉLIORATION CRUCIALE"""
         
         try:
-            # Extraire les informations personnelles
-            personal_info = self._extract_personal_info(content)
-            
+            # Extraire les informations personnelles (seulement si le début
+            # du document ressemble à un CV)
+            if _CV_GATE_RE.search(content[:2000]):
+                personal_info = self._extract_personal_info(content)
+            else:
+                personal_info = {}
+
+            # Un seul timestamp (UTC, aware) pour tous les chunks du document
+            now_iso = datetime.now(timezone.utc).isoformat()
+
             chunks = []
             
             # Créer un chunk spécial avec les informations personnelles en premier
@@ -670,34 +736,36 @@ class DocumentService:
                 info_text = "\n".join(info_lines)
                 
                 # Créer le chunk d'informations personnelles
+                info_word_count = _count_words(info_text)
                 personal_chunk = DocumentChunkData(
                     content=info_text,
                     chunk_index=0,
                     start_position=0,
                     end_position=len(info_text),
+                    word_count=info_word_count,
                     metadata={
                         "filename": metadata.filename,
                         "file_type": metadata.file_type,
                         "chunk_type": "personal_info",
                         "chunk_length": len(info_text),
-                        "word_count": len(info_text.split()),
+                        "word_count": info_word_count,
                         "personal_info": personal_info,
-                        "created_at": datetime.now().isoformat()
+                        "created_at": now_iso
                     }
                 )
                 chunks.append(personal_chunk)
                 
                 logger.info(f"Chunk d'informations personnelles créé: {len(info_text)} caractères")
             
-            # Chunking normal pour le reste du contenu
-            regular_chunks = await self._chunk_text_enhanced(content, metadata, personal_info)
-            
-            # Ajouter les chunks réguliers en ajustant les index
-            for chunk in regular_chunks:
+            # Chunking normal pour le reste du contenu, consommé au fil de
+            # l'eau depuis le générateur (index ajustés à la volée)
+            regular_count = 0
+            async for chunk in self._chunk_text_enhanced(content, metadata, personal_info, now_iso):
                 chunk.chunk_index = len(chunks)
                 chunks.append(chunk)
-            
-            logger.info(f"Total de {len(chunks)} chunks créés (1 personnel + {len(regular_chunks)} réguliers)")
+                regular_count += 1
+
+            logger.info(f"Total de {len(chunks)} chunks créés (1 personnel + {regular_count} réguliers)")
             
             return chunks
             
@@ -706,92 +774,227 @@ class DocumentService:
             # Fallback vers le chunking simple
             return await self._chunk_text_simple(content, metadata)
 
-    async def _chunk_text_enhanced(self, content: str, metadata: DocumentMetadata, personal_info: Dict[str, Any]) -> List[DocumentChunkData]:
-        """Chunking amélioré qui enrichit chaque chunk avec les infos personnelles"""
-        
-        try:
-            chunks = []
-            paragraphs = content.split('\n\n')
-            current_chunk = ""
-            chunk_index = 0
-            start_pos = 0
-            
-            # Préfixe à ajouter à chaque chunk pour améliorer la recherche
-            context_prefix = ""
-            if personal_info:
-                prefix_parts = []
-                if 'name' in personal_info:
-                    prefix_parts.append(f"[Étudiant: {personal_info['name']}]")
-                if 'school_confirmed' in personal_info:
-                    prefix_parts.append(f"[École: {personal_info['school_confirmed']}]")
-                if 'specialty_confirmed' in personal_info:
-                    prefix_parts.append(f"[Spécialité: {personal_info['specialty_confirmed']}]")
-                
-                if prefix_parts:
-                    context_prefix = " ".join(prefix_parts) + " "
-            
-            for paragraph in paragraphs:
-                paragraph = paragraph.strip()
-                if not paragraph:
-                    continue
-                
-                # Paragraphe trop long
-                if len(paragraph) > self.chunk_size:
-                    # Sauvegarder le chunk actuel
-                    if current_chunk:
-                        enhanced_content = context_prefix + current_chunk
-                        chunks.append(self._create_chunk_data(
-                            enhanced_content, chunk_index, start_pos, 
-                            start_pos + len(enhanced_content), metadata, personal_info
-                        ))
-                        chunk_index += 1
-                        start_pos += len(enhanced_content)
-                        current_chunk = ""
-                    
-                    # Diviser le paragraphe long
-                    sub_chunks = self._split_long_paragraph(paragraph)
-                    for sub_chunk in sub_chunks:
-                        enhanced_content = context_prefix + sub_chunk
-                        chunks.append(self._create_chunk_data(
-                            enhanced_content, chunk_index, start_pos,
-                            start_pos + len(enhanced_content), metadata, personal_info
-                        ))
-                        chunk_index += 1
-                        start_pos += len(enhanced_content)
-                
-                # Le paragraphe peut être ajouté au chunk actuel
-                elif len(current_chunk) + len(paragraph) + 2 <= self.chunk_size - len(context_prefix):
-                    if current_chunk:
-                        current_chunk += "\n\n" + paragraph
-                    else:
-                        current_chunk = paragraph
-                
-                # Le chunk actuel est plein, commencer un nouveau
-                else:
-                    if current_chunk:
-                        enhanced_content = context_prefix + current_chunk
-                        chunks.append(self._create_chunk_data(
-                            enhanced_content, chunk_index, start_pos,
-                            start_pos + len(enhanced_content), metadata, personal_info
-                        ))
-                        chunk_index += 1
-                        start_pos += len(enhanced_content)
-                    
-                    current_chunk = paragraph
-            
-            # Ajouter le dernier chunk
-            if current_chunk:
-                enhanced_content = context_prefix + current_chunk
-                chunks.append(self._create_chunk_data(
-                    enhanced_content, chunk_index, start_pos,
-                    start_pos + len(enhanced_content), metadata, personal_info
-                ))
-            
-            return chunks
-            
-        except Exception as e:
-            logger.error(f"Erreur chunking amélioré: {str(e)}")
-            return await self._chunk_text_simple(content, metadata)
+    @staticmethod
+    def _iter_paragraphs(content: str):
+        """Itérer sur les paragraphes sans matérialiser une liste de str.
+
+        Pour les gros documents, `content.split('\\n\\n')` crée des dizaines de
+        milliers de petits objets str. On calcule les offsets des séparateurs
+        '\\n\\n' de façon vectorisée avec NumPy et on n'émet que des slices.
+        """
+        # Petits documents: le split classique reste plus rapide
+        if len(content) < 4096:
+            yield from content.split('\n\n')
+            return
+
+        buf = content.encode('utf-8')
+        arr = np.frombuffer(buf, dtype=np.uint8)
+        nl = np.flatnonzero(arr == 0x0A)
+        # Positions (en octets) où un '\n' est immédiatement suivi d'un autre
+        boundaries = nl[np.where(np.diff(nl) == 1)[0]]
+
+        if len(buf) == len(content):
+            # Contenu ASCII: les offsets octets == offsets caractères
+            start = 0
+            for b in boundaries:
+                yield content[start:b]
+                start = int(b) + 2
+            yield content[start:]
+        else:
+            # Caractères multi-octets: retomber sur les slices via les octets
+            start = 0
+            for b in boundaries:
+                yield buf[start:b].decode('utf-8')
+                start = int(b) + 2
+            yield buf[start:].decode('utf-8')
+
+    async def _chunk_text_enhanced(
+        self,
+        content: str,
+        metadata: DocumentMetadata,
+        personal_info: Dict[str, Any],
+        created_at: Optional[str] = None
+    ):
+        """Chunking amélioré qui enrichit chaque chunk avec les infos personnelles.
+
+        Générateur asynchrone: les chunks sont produits un à un, sans
+        matérialiser la liste complète (la gestion d'erreur et le fallback
+        simple restent dans _chunk_text_with_personal_info).
+        """
+
+        now_iso = created_at or datetime.now(timezone.utc).isoformat()
+        paragraphs = self._iter_paragraphs(content)
+        # Accumulation en liste + longueur courante: évite les copies
+        # quadratiques des concaténations str au fil du chunk
+        current_parts: List[str] = []
+        current_len = 0
+        chunk_index = 0
+        start_pos = 0
+
+        # Préfixe à ajouter à chaque chunk pour améliorer la recherche
+        context_prefix = self._build_context_prefix(personal_info)
+
+        # Constantes du chunk, sorties de la boucle chaude
+        prefix_len = len(context_prefix)
+        budget = self.chunk_size - prefix_len
+
+        # Très gros documents: si aucun paragraphe ne dépasse le gabarit,
+        # les bornes de chunks se calculent par somme cumulée + recherche
+        # binaire NumPy au lieu d'une boucle Python par paragraphe
+        if len(content) >= 65536:
+            plist = [s for s in map(str.strip, paragraphs) if s]
+            if plist:
+                lens = np.fromiter(map(len, plist), dtype=np.int32, count=len(plist))
+                if int(lens.max()) <= budget:
+                    for chunk in self._chunk_paragraphs_vectorized(
+                        plist, lens, budget, metadata, personal_info,
+                        now_iso, context_prefix
+                    ):
+                        yield chunk
+                    return
+            # Paragraphe hors gabarit: retomber sur la boucle classique
+            paragraphs = plist
+
+        for paragraph in paragraphs:
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+
+            plen = len(paragraph)
+
+            # Cas courant testé en premier: le paragraphe tient dans le
+            # chunk actuel (arithmétique entière pure, pas de re-scan)
+            if current_len + plen + 2 <= budget:
+                if current_parts:
+                    current_len += 2
+                current_parts.append(paragraph)
+                current_len += plen
+                continue
+
+            # Paragraphe trop long
+            if plen > self.chunk_size:
+                # Sauvegarder le chunk actuel
+                if current_parts:
+                    body = "\n\n".join(current_parts)
+                    yield self._create_chunk_data(
+                        body, chunk_index, start_pos,
+                        start_pos + current_len, metadata, personal_info, now_iso,
+                        context_prefix
+                    )
+                    chunk_index += 1
+                    start_pos += current_len
+                    current_parts = []
+                    current_len = 0
+
+                # Diviser le paragraphe long
+                sub_chunks = self._split_long_paragraph(paragraph)
+                for sub_chunk in sub_chunks:
+                    yield self._create_chunk_data(
+                        sub_chunk, chunk_index, start_pos,
+                        start_pos + len(sub_chunk), metadata, personal_info, now_iso,
+                        context_prefix
+                    )
+                    chunk_index += 1
+                    start_pos += len(sub_chunk)
+
+            # Le chunk actuel est plein, commencer un nouveau
+            else:
+                if current_parts:
+                    body = "\n\n".join(current_parts)
+                    yield self._create_chunk_data(
+                        body, chunk_index, start_pos,
+                        start_pos + current_len, metadata, personal_info, now_iso,
+                        context_prefix
+                    )
+                    chunk_index += 1
+                    start_pos += current_len
+
+                current_parts = [paragraph]
+                current_len = plen
+
+        # Ajouter le dernier chunk
+        if current_parts:
+            body = "\n\n".join(current_parts)
+            yield self._create_chunk_data(
+                body, chunk_index, start_pos,
+                start_pos + current_len, metadata, personal_info, now_iso,
+                context_prefix
+            )
+
+    def _build_context_prefix(self, personal_info: Dict[str, Any]) -> str:
+        """Construire le préfixe de contexte, avec cache par étudiant.
+
+        Le même triplet (nom, école, spécialité) revient pour tous les
+        documents d'un même étudiant: le préfixe n'est formaté qu'une fois
+        puis interné, ce qui rend égalité et hachage O(1) en aval.
+        """
+        if not personal_info:
+            return ""
+
+        key = (
+            personal_info.get('name', ''),
+            personal_info.get('school_confirmed', ''),
+            personal_info.get('specialty_confirmed', ''),
+        )
+        prefix = self._prefix_cache.get(key)
+        if prefix is None:
+            prefix_parts = []
+            if key[0]:
+                prefix_parts.append(f"[Étudiant: {key[0]}]")
+            if key[1]:
+                prefix_parts.append(f"[École: {key[1]}]")
+            if key[2]:
+                prefix_parts.append(f"[Spécialité: {key[2]}]")
+
+            prefix = sys.intern(" ".join(prefix_parts) + " ") if prefix_parts else ""
+            self._prefix_cache[key] = prefix
+
+        return prefix
+
+    def _chunk_paragraphs_vectorized(
+        self,
+        paragraphs: List[str],
+        lens: np.ndarray,
+        budget: int,
+        metadata: DocumentMetadata,
+        personal_info: Dict[str, Any],
+        now_iso: str,
+        context_prefix: str
+    ) -> List[DocumentChunkData]:
+        """Découper par recherche binaire sur les longueurs cumulées.
+
+        Le scan O(P) des longueurs se fait en C (cumsum + searchsorted);
+        la boucle Python ne tourne plus qu'une fois par chunk produit,
+        pas une fois par paragraphe. Préserve le découpage glouton de la
+        boucle classique (même coût de séparateur '\\n\\n' par paragraphe).
+        """
+        # Coût de chaque paragraphe, séparateur inclus: la somme d'une
+        # tranche vaut alors len(body) + 2
+        costs = lens.astype(np.int64) + 2
+        cum = np.cumsum(costs)
+
+        chunks = []
+        chunk_index = 0
+        start_pos = 0
+        start = 0
+        base = 0
+        total = len(paragraphs)
+
+        while start < total:
+            end = int(np.searchsorted(cum, base + budget + 2, side='right'))
+            if end == start:
+                end = start + 1
+            body = "\n\n".join(paragraphs[start:end])
+            chunks.append(self._create_chunk_data(
+                body, chunk_index, start_pos, start_pos + len(body),
+                metadata, personal_info, now_iso, context_prefix
+            ))
+            chunk_index += 1
+            start_pos += len(body)
+            base = int(cum[end - 1])
+            start = end
+
+        return chunks
 
     def _create_chunk_data(
         self, 
@@ -800,24 +1003,40 @@ class DocumentService:
         start: int, 
         end: int, 
         metadata: DocumentMetadata,
-        personal_info: Dict[str, Any] = None
+        personal_info: Dict[str, Any] = None,
+        created_at: Optional[str] = None,
+        context_prefix: str = ""
     ) -> DocumentChunkData:
-        """Créer un objet DocumentChunkData enrichi"""
-        
+        """Créer un objet DocumentChunkData enrichi.
+
+        Le préfixe de contexte, identique pour tous les chunks du document,
+        est stocké une seule fois dans les métadonnées plutôt que concaténé
+        dans chaque contenu; l'indexation le préfixe au moment de l'embed.
+        """
+
+        # Compté une seule fois ici, réutilisé par _save_chunks
+        word_count = _count_words(content)
+
         chunk_metadata = {
             "filename": metadata.filename,
             "file_type": metadata.file_type,
             "chunk_length": len(content),
-            "word_count": len(content.split()),
-            "created_at": datetime.now().isoformat()
+            "word_count": word_count,
+            "created_at": created_at or datetime.now(timezone.utc).isoformat()
         }
+
+        if context_prefix:
+            chunk_metadata["context_prefix"] = context_prefix
         
         # Ajouter les informations personnelles au metadata du chunk
+        # (valeurs internées: partagées entre tous les chunks du document)
         if personal_info:
+            school = personal_info.get('school_confirmed', personal_info.get('school'))
+            specialty = personal_info.get('specialty_confirmed', personal_info.get('specialty'))
             chunk_metadata.update({
                 "student_name": personal_info.get('name'),
-                "school": personal_info.get('school_confirmed', personal_info.get('school')),
-                "specialty": personal_info.get('specialty_confirmed', personal_info.get('specialty')),
+                "school": sys.intern(school) if school else school,
+                "specialty": sys.intern(specialty) if specialty else specialty,
                 "has_personal_info": True
             })
         
@@ -826,44 +1045,58 @@ class DocumentService:
             chunk_index=index,
             start_position=start,
             end_position=end,
+            word_count=word_count,
             metadata=chunk_metadata
         )
 
+    @staticmethod
+    def _split_sentences(text: str) -> List[str]:
+        """Découper en phrases par scan linéaire (translate + split).
+
+        Équivalent à re.split(r'[.!?]+', ...) mais sans le moteur regex: les
+        terminateurs successifs produisent des morceaux vides, que les
+        appelants ignorent déjà via strip().
+        """
+        return text.translate(_SENT_TRANS_TABLE).split('\x01')
+
     def _split_long_paragraph(self, paragraph: str) -> List[str]:
         """Diviser un paragraphe trop long en phrases"""
         chunks = []
-        sentences = re.split(r'[.!?]+', paragraph)
-        current_chunk = ""
-        
+        sentences = self._split_sentences(paragraph)
+        current_parts: List[str] = []
+        current_len = 0
+
         for sentence in sentences:
             sentence = sentence.strip()
             if not sentence:
                 continue
-                
-            if len(current_chunk) + len(sentence) + 2 <= self.chunk_size:
-                if current_chunk:
-                    current_chunk += ". " + sentence
-                else:
-                    current_chunk = sentence
+
+            if current_len + len(sentence) + 2 <= self.chunk_size:
+                if current_parts:
+                    current_len += 2
+                current_parts.append(sentence)
+                current_len += len(sentence)
             else:
-                if current_chunk:
-                    chunks.append(current_chunk + ".")
-                current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk + ".")
-        
+                if current_parts:
+                    chunks.append(". ".join(current_parts) + ".")
+                current_parts = [sentence]
+                current_len = len(sentence)
+
+        if current_parts:
+            chunks.append(". ".join(current_parts) + ".")
+
         return chunks
 
     async def _chunk_text_simple(self, content: str, metadata: DocumentMetadata) -> List[DocumentChunkData]:
         """Méthode de chunking simple par mots (fallback)"""
         chunks = []
-        words = content.split()
         current_chunk = []
         current_length = 0
         chunk_index = 0
-        
-        for word in words:
+
+        # finditer évite d'allouer d'un coup la liste de tous les mots
+        for match in _WORD_RE.finditer(content):
+            word = match.group()
             word_length = len(word) + 1
             
             if current_length + word_length > self.chunk_size and current_chunk:
@@ -886,10 +1119,37 @@ class DocumentService:
         
         return chunks
 
-    def _check_duplicate(self, checksum: str) -> Optional[Document]:
-        """Vérifier si un document existe déjà"""
+    async def _check_duplicate(self, metadata: DocumentMetadata, file_path: str) -> Optional[Document]:
+        """Vérifier si un document existe déjà.
+
+        Rejet rapide via le hash des 64 premiers Ko: dans le cas courant
+        (aucun doublon), le checksum complet du fichier n'est jamais calculé.
+        """
         try:
-            return self.db.query(Document).filter(Document.file_hash == checksum).first()
+            candidate = self.db.query(Document).filter(
+                Document.fast_hash == metadata.fast_hash
+            ).first()
+
+            if not candidate:
+                # Les documents antérieurs à l'ajout de fast_hash ont la
+                # colonne à NULL et échappent au rejet rapide: tant qu'il
+                # en reste, confirmer avec le checksum complet, sans quoi
+                # leur ré-upload finirait en IntegrityError sur file_hash
+                # au lieu du chemin "document déjà existant"
+                legacy_row = self.db.query(Document).filter(
+                    Document.fast_hash.is_(None)
+                ).first()
+                if legacy_row is None:
+                    return None
+
+            # Candidat (ou lignes héritées sans fast_hash): confirmer avec
+            # le checksum complet
+            if metadata.checksum is None:
+                metadata.checksum = await self._calculate_checksum(file_path)
+
+            return self.db.query(Document).filter(
+                Document.file_hash == metadata.checksum
+            ).first()
         except Exception as e:
             logger.error(f"Erreur vérification doublon: {str(e)}")
             return None
@@ -906,13 +1166,18 @@ class DocumentService:
         """Créer un document en base de données"""
         try:
             document_type = self._get_document_type(metadata.file_type)
-            
+
+            # Le checksum complet peut avoir été différé par le rejet rapide
+            if metadata.checksum is None:
+                metadata.checksum = await self._calculate_checksum(file_path)
+
             document = Document(
                 filename=metadata.filename,
                 original_filename=metadata.filename,
                 file_path=file_path,
                 file_size=metadata.file_size,
                 file_hash=metadata.checksum,
+                fast_hash=metadata.fast_hash,
                 document_type=document_type,
                 mime_type=metadata.mime_type,
                 embeddings_status=EmbeddingStatus.PENDING,
@@ -935,37 +1200,43 @@ class DocumentService:
 
     def _get_document_type(self, file_extension: str) -> DocumentType:
         """Mapper l'extension au type de document"""
-        mapping = {
-            '.pdf': DocumentType.PDF,
-            '.docx': DocumentType.DOCX,
-            '.txt': DocumentType.TXT,
-            '.md': DocumentType.MD
-        }
-        return mapping.get(file_extension, DocumentType.TXT)
+        return _EXT_TO_TYPE.get(file_extension.lower(), DocumentType.TXT)
 
-    async def _save_chunks(self, document_id: int, chunks: List[DocumentChunkData]):
-        """Sauvegarder les chunks en base de données"""
+    async def _save_chunks(self, document_id: int, chunks):
+        """Sauvegarder les chunks en base de données.
+
+        Accepte tout itérable de DocumentChunkData et insère par lots de
+        _CHUNK_INSERT_BATCH: la mémoire des dicts de lignes reste bornée
+        quel que soit le nombre de chunks du document.
+        """
         try:
-            chunk_objects = []
-            
+            # bulk_insert_mappings évite le suivi unit-of-work par instance et
+            # regroupe les INSERT; les IDs des chunks ne sont pas utilisés ici
+            buffer = []
+            total = 0
             for chunk_data in chunks:
-                chunk = DocumentChunk(
-                    document_id=document_id,
-                    content=chunk_data.content,
-                    chunk_index=chunk_data.chunk_index,
-                    chunk_size=len(chunk_data.content),
-                    word_count=len(chunk_data.content.split()),
-                    start_position=chunk_data.start_position,
-                    end_position=chunk_data.end_position,
-                    metadata=chunk_data.metadata
-                )
-                chunk_objects.append(chunk)
-            
-            self.db.add_all(chunk_objects)
-            self.db.flush()  # Important: ne pas commit ici, laisser le contrôle à process_document
-            
-            logger.info(f"Sauvegarde de {len(chunk_objects)} chunks pour le document {document_id}")
-            
+                buffer.append({
+                    "document_id": document_id,
+                    "content": chunk_data.content,
+                    "chunk_index": chunk_data.chunk_index,
+                    "chunk_size": len(chunk_data.content),
+                    "word_count": chunk_data.word_count,
+                    "start_position": chunk_data.start_position,
+                    "end_position": chunk_data.end_position,
+                    "metad": chunk_data.metadata
+                })
+                if len(buffer) >= _CHUNK_INSERT_BATCH:
+                    self.db.bulk_insert_mappings(DocumentChunk, buffer)
+                    total += len(buffer)
+                    buffer.clear()
+
+            if buffer:
+                # Pas de flush ici: la transaction est pilotée par process_document
+                self.db.bulk_insert_mappings(DocumentChunk, buffer)
+                total += len(buffer)
+
+            logger.info(f"Sauvegarde de {total} chunks pour le document {document_id}")
+
         except Exception as e:
             logger.error(f"Erreur sauvegarde chunks: {str(e)}")
             raise
@@ -1003,30 +1274,47 @@ class DocumentService:
             logger.error(f"Erreur récupération document {document_id}: {str(e)}")
             return None
 
-    def delete_document(self, document_id: int, user_id: int) -> bool:
-        """Supprimer un document"""
+    def _delete_row_sync(self, document_id: int, user_id: int) -> int:
+        # Un seul DELETE paramétré: pas de SELECT préalable ni de
+        # matérialisation ORM, la cascade vers les chunks est faite par la
+        # base (ON DELETE CASCADE sur document_chunks.document_id)
+        result = self.db.execute(
+            delete(Document).where(
+                and_(Document.id == document_id, Document.uploaded_by == user_id)
+            )
+        )
+        self.db.commit()
+        return result.rowcount
+
+    async def delete_document(self, document_id: int, user_id: int) -> bool:
+        """Supprimer un document.
+
+        La suppression des embeddings est attendue dans le même contexte
+        async (plus de tâche fire-and-forget qui pouvait être perdue) et
+        recouvre la suppression SQL exécutée dans l'executor.
+        """
         try:
-            document = self.get_document(document_id, user_id)
-            if not document:
-                logger.warning(f"Document {document_id} non trouvé pour utilisateur {user_id}")
-                return False
-            
+            loop = asyncio.get_event_loop()
+            tasks = [loop.run_in_executor(self.executor, self._delete_row_sync, document_id, user_id)]
+
             # Supprimer des embeddings si le service est disponible
             if self.embedding_service:
-                try:
-                    asyncio.create_task(
-                        self.embedding_service.delete_document(str(document_id))
-                    )
-                except Exception as e:
-                    logger.warning(f"Erreur suppression embeddings: {str(e)}")
-            
-            # Supprimer le document
-            self.db.delete(document)
-            self.db.commit()
-            
+                tasks.append(self.embedding_service.delete_document(str(document_id)))
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for result in results[1:]:
+                if isinstance(result, Exception):
+                    logger.warning(f"Erreur suppression embeddings: {str(result)}")
+            if isinstance(results[0], Exception):
+                raise results[0]
+
+            if results[0] == 0:
+                logger.warning(f"Document {document_id} non trouvé pour utilisateur {user_id}")
+                return False
+
             logger.info(f"Document {document_id} supprimé pour utilisateur {user_id}")
             return True
-            
+
         except Exception as e:
             logger.error(f"Erreur suppression document {document_id}: {str(e)}")
             return False
@@ -1034,29 +1322,19 @@ class DocumentService:
     def get_document_stats(self, user_id: int) -> Dict[str, Any]:
         """Récupérer les statistiques de documents d'un utilisateur"""
         try:
-            total_docs = self.db.query(Document).filter(Document.uploaded_by == user_id).count()
-            
-            processed_docs = self.db.query(Document).filter(
-                and_(
-                    Document.uploaded_by == user_id,
-                    Document.embeddings_status == EmbeddingStatus.COMPLETED
-                )
-            ).count()
-            
-            pending_docs = self.db.query(Document).filter(
-                and_(
-                    Document.uploaded_by == user_id,
-                    Document.embeddings_status == EmbeddingStatus.PENDING
-                )
-            ).count()
-            
-            processing_docs = self.db.query(Document).filter(
-                and_(
-                    Document.uploaded_by == user_id,
-                    Document.embeddings_status == EmbeddingStatus.PROCESSING
-                )
-            ).count()
-            
+            # Une seule agrégation GROUP BY au lieu de quatre COUNT séparés
+            counts = dict(
+                self.db.query(Document.embeddings_status, func.count(Document.id))
+                .filter(Document.uploaded_by == user_id)
+                .group_by(Document.embeddings_status)
+                .all()
+            )
+
+            total_docs = sum(counts.values())
+            processed_docs = counts.get(EmbeddingStatus.COMPLETED, 0)
+            pending_docs = counts.get(EmbeddingStatus.PENDING, 0)
+            processing_docs = counts.get(EmbeddingStatus.PROCESSING, 0)
+
             return {
                 "total_documents": total_docs,
                 "processed_documents": processed_docs,
@@ -1073,4 +1351,24 @@ class DocumentService:
                 "pending_documents": 0,
                 "processing_documents": 0,
                 "processing_rate": 0
-            }
\ No newline at end of file
+            }
+
+    def get_overview(
+        self,
+        user_id: int,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Tuple[Dict[str, Any], List[Document]]:
+        """Statistiques + documents récents en un seul appel.
+
+        Les tableaux de bord appelaient stats puis liste séparément; ici les
+        deux requêtes partagent la même transaction et les index
+        (uploaded_by, ...), ce qui évite un aller-retour et un re-scan.
+        """
+        try:
+            stats = self.get_document_stats(user_id)
+            documents = self.get_documents(user_id, limit, offset)
+            return stats, documents
+        except Exception as e:
+            logger.error(f"Erreur overview documents pour utilisateur {user_id}: {str(e)}")
+            return self.get_document_stats(user_id), []
\ No newline at end of file
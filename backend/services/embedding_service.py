@@ -1,12 +1,20 @@
 # services/embedding_service_improved.py - VERSION CORRIGÉE POUR ISOLATION DES DOCUMENTS
+import functools
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import os
+import sqlite3
+import string
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, TypedDict
 from datetime import datetime
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
 import asyncio
+from collections import Counter, namedtuple, OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 import re
 
@@ -15,6 +23,418 @@ from utils.text_processing import TextProcessor
 
 logger = logging.getLogger(__name__)
 
+# Taille des sous-lots envoyés à ChromaDB. La plage 100-250 donne le
+# meilleur débit: au-delà, Chroma sérialise un payload géant d'un coup
+# (pics mémoire), en deçà le coût fixe par appel domine.
+_CHROMA_SUB_BATCH = 250
+
+# Classes de caractères accentués partagées par les patterns ci-dessous
+# (définies une fois: le parsing de ces longues classes n'est payé qu'à l'import)
+_UC = "A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ"
+_LC = "a-zàâäéèêëïîôöùûüÿç"
+
+# Patterns de détection de nom, compilés une fois pour toutes
+_NAME_PATTERNS = [
+    re.compile(p, re.MULTILINE) for p in (
+        rf'^\s*([{_UC}][{_LC}]+\s+[{_UC}][{_LC}]+(?:\s+[{_UC}][{_LC}]+)?)\s*$',
+        rf'Nom\s*:?\s*([{_UC}][{_LC}]+(?:\s+[{_UC}][{_LC}]+)+)',
+        rf'([{_UC}][{_LC}]+\s+[{_UC}][{_LC}]+)\s*\n.*(?:Ingénieur|Développeur|Étudiant)',
+        rf'^([{_UC}]{{2,}}\s+[{_UC}]{{2,}})\s*$',
+    )
+]
+
+# Titres de sections de CV: les patterns sont fusionnés en une seule
+# alternation, donc un seul passage du moteur regex par ligne au lieu de
+# cinq appels Python successifs (la variante capitalisée est couverte par
+# IGNORECASE). Le groupe capturant non vide donne le titre.
+_SECTION_TITLE_RE = re.compile(
+    "|".join((
+        rf'^([{_UC}\s]{{3,50}})(?:\s*:?\s*)?$',
+        rf'^\s*([IVX]+[\.\)]\s+[{_UC}][A-Za-z{_LC}\s]{{5,50}})',
+        rf'^\s*([0-9]+[\.\)]\s+[{_UC}][A-Za-z{_LC}\s]{{5,50}})',
+        r'^\s*(FORMATION|EXPÉRIENCE|COMPÉTENCES|PROJETS|CERTIFICATIONS|LANGUES|CONTACT|PROFIL|OBJECTIF|DIPLÔMES)S?\s*:?\s*$',
+    )),
+    re.IGNORECASE
+)
+
+# Au-delà de cette longueur, une ligne ne peut pas être un titre de section
+_SECTION_TITLE_MAX_LEN = 60
+
+_EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+_PHONE_PATTERNS = [
+    re.compile(p) for p in (
+        r'(?:\+33|0)[1-9](?:[0-9]{8})',
+        r'(?:\+212|0)[5-7][0-9]{8}',
+        r'\b\d{2}[-\s]?\d{2}[-\s]?\d{2}[-\s]?\d{2}[-\s]?\d{2}\b',
+    )
+]
+
+# Normalisation des noms pour les clés d'isolation
+_NON_ALPHA_RE = re.compile(r'[^a-zA-Z\s]')
+_WS_RE = re.compile(r'\s+')
+
+# Table de suppression pour str.translate: tout caractère ASCII qui n'est
+# ni une minuscule ni un blanc est éliminé en une passe C, sans regex
+_NAME_KEEP = set(string.ascii_lowercase + string.whitespace)
+_NAME_DEL_TRANS = {ord(c): None for c in set(map(chr, range(128))) - _NAME_KEEP}
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_person_name(name: str) -> str:
+    """Normaliser un nom pour les clés d'isolation (minuscules, '_').
+
+    Mémoïsé: _is_same_person renormalise la même cible pour chaque
+    candidat d'une recherche, seul le premier appel paie la passe de
+    nettoyage.
+    """
+    lowered = name.lower()
+    if lowered.isascii():
+        # Cas courant: une seule allocation via translate
+        cleaned = lowered.translate(_NAME_DEL_TRANS)
+    else:
+        # Accents et autres non-ASCII: même sémantique que la table,
+        # assurée par la regex
+        cleaned = _NON_ALPHA_RE.sub('', lowered)
+    return _WS_RE.sub('_', cleaned.strip())
+
+# Années (exclusion des titres de section contenant une date)
+_YEAR_RE = re.compile(r'\d{4}')
+
+# Mots-clés par domaine technique et par section (hoistés de _extract_keywords)
+_DOMAIN_KEYWORDS = {
+    'web': ['html', 'css', 'javascript', 'react', 'vue', 'angular', 'php', 'laravel', 'django', 'flask'],
+    'mobile': ['android', 'ios', 'react native', 'flutter', 'kotlin', 'swift'],
+    'data': ['python', 'r', 'machine learning', 'data science', 'ai', 'tensorflow', 'pytorch', 'pandas'],
+    'database': ['sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'nosql'],
+    'devops': ['docker', 'kubernetes', 'aws', 'azure', 'gcp', 'git', 'jenkins', 'ci/cd'],
+    'general': ['java', 'c++', 'c#', 'python', 'api', 'rest', 'microservices', 'agile', 'scrum']
+}
+
+_SECTION_KEYWORDS = {
+    'formation': ['université', 'école', 'diplôme', 'master', 'licence', 'formation', 'étude'],
+    'expérience': ['stage', 'emploi', 'poste', 'entreprise', 'société', 'travail', 'mission'],
+    'projets': ['projet', 'développement', 'création', 'réalisation', 'conception', 'implémentation'],
+    'compétences': ['compétence', 'maîtrise', 'connaissance', 'expertise', 'skill', 'niveau'],
+    'certifications': ['certification', 'diplôme', 'titre', 'qualification', 'accréditation']
+}
+
+# Tous les termes fusionnés en une seule alternation (les plus longs en
+# premier): une passe du moteur regex sur le texte remplace ~50 scans
+# `term in text` successifs
+_ALL_KEYWORD_TERMS = (
+    {t for terms in _DOMAIN_KEYWORDS.values() for t in terms}
+    | {t for terms in _SECTION_KEYWORDS.values() for t in terms}
+)
+_KEYWORD_SCAN_RE = re.compile(
+    "|".join(re.escape(t) for t in sorted(_ALL_KEYWORD_TERMS, key=len, reverse=True))
+)
+_DOMAIN_TERM_SET = frozenset(t for terms in _DOMAIN_KEYWORDS.values() for t in terms)
+_SECTION_TERM_SETS = {key: frozenset(terms) for key, terms in _SECTION_KEYWORDS.items()}
+
+# Indicateurs par type de chunk (hoistés de _identify_chunk_type), avec la
+# même mécanique de scan unique que _extract_keywords: une passe du moteur
+# regex puis des intersections d'ensembles, au lieu de 8 parcours du texte
+_CHUNK_TYPE_KEYWORDS = {
+    'education': ['formation', 'diplôme', 'université', 'école', 'master', 'licence', 'baccalauréat', 'étude', 'cursus'],
+    'experience': ['stage', 'expérience', 'emploi', 'poste', 'entreprise', 'société', 'travail', 'mission', 'responsabilité'],
+    'project': ['projet', 'réalisation', 'développement', 'création', 'conception', 'implémentation', 'application', 'site web'],
+    'skills': ['compétence', 'skill', 'maîtrise', 'connaissance', 'expertise', 'niveau', 'langage', 'outil', 'technologie'],
+    'certification': ['certification', 'diplôme', 'titre', 'qualification', 'accréditation', 'attestation'],
+    'contact': ['contact', 'téléphone', 'email', 'adresse', 'linkedin', 'github', '@', 'mail'],
+    'languages': ['langue', 'anglais', 'français', 'espagnol', 'arabe', 'niveau', 'bilingue', 'courant'],
+    'personal_info': ['nom', 'âge', 'nationalité', 'situation', 'permis', 'véhicule']
+}
+_CHUNK_TYPE_SCAN_RE = re.compile(
+    "|".join(re.escape(t) for t in sorted(
+        {t for terms in _CHUNK_TYPE_KEYWORDS.values() for t in terms},
+        key=len, reverse=True
+    ))
+)
+_CHUNK_TYPE_TERM_SETS = {key: frozenset(terms) for key, terms in _CHUNK_TYPE_KEYWORDS.items()}
+
+
+class SearchResult(TypedDict, total=False):
+    """Forme des résultats de recherche échangés entre les étapes.
+
+    Les résultats restent des dicts (ils traversent la frontière du
+    service vers rag_service et l'API telles quelles); le TypedDict fige
+    la liste des clés sans imposer de conversion à la sortie.
+    """
+    content: str
+    similarity_score: float
+    distance: float
+    document_id: str
+    source_file: str
+    chunk_index: int
+    chunk_type: str
+    section_title: str
+    keywords: str
+    content_preview: str
+    timestamp: Optional[str]
+    metadata: Dict[str, Any]
+    person_name: str
+    isolation_key: str
+    search_strategy: str
+    search_strategies: List[str]
+    primary_strategy: str
+    multi_strategy: bool
+    isolation_valid: bool
+    final_score: float
+    bi_encoder_score: float
+    bm25_score: float
+
+
+# Bonus de re-ranking par type de chunk (hoisté: le dict littéral était
+# reconstruit pour chaque résultat dans la boucle de scoring)
+_RERANK_TYPE_BONUS = {
+    "skills": 0.15,
+    "experience": 0.12,
+    "project": 0.10,
+    "education": 0.08,
+    "certification": 0.08,
+    "general": 0.0
+}
+
+# Libellés de types de chunk pour l'en-tête de contexte (hoistés de
+# _enrich_chunk_with_isolation: le dict n'est plus reconstruit par chunk)
+_TYPE_LABELS = {
+    "education": "FORMATION_ET_EDUCATION",
+    "experience": "EXPERIENCE_PROFESSIONNELLE",
+    "project": "PROJETS_ET_REALISATIONS",
+    "skills": "COMPETENCES_ET_EXPERTISE",
+    "certification": "CERTIFICATIONS_ET_DIPLOMES",
+    "contact": "INFORMATIONS_CONTACT",
+    "languages": "LANGUES",
+    "personal_info": "INFORMATIONS_PERSONNELLES",
+    "general": "INFORMATIONS_GENERALES"
+}
+
+# Fragments d'isolation constants par document: assemblés une fois dans
+# _create_isolated_chunks puis concaténés tels quels pour chaque chunk
+_IsolationTemplate = namedtuple("_IsolationTemplate", ["header", "candidate", "open_tag", "close_tag"])
+
+# Dérivés de la requête (minuscules, tokens, signature, mots-clés) calculés
+# une seule fois par recherche puis partagés entre les branches mots-clés
+# et re-ranking au lieu d'être recalculés dans chacune
+_QueryContext = namedtuple("_QueryContext", ["lower", "tokens", "words", "signature", "keywords"])
+
+# Conversion des valeurs de métadonnées pour ChromaDB: dispatch sur le type
+# exact au lieu de rejouer la chaîne d'isinstance pour chaque champ
+_META_CONVERTERS = {
+    type(None): lambda v: "",
+    str: lambda v: v,
+    int: lambda v: v,
+    float: lambda v: v,
+    bool: lambda v: v,
+    list: lambda v: ", ".join(str(item) for item in v if item),
+}
+
+
+# Taille du cache LRU des embeddings de requêtes (~3 Mo à 384 floats)
+_QUERY_EMB_CACHE_MAX = 2048
+
+# Durée de validité des statistiques de collection mises en cache
+_STATS_TTL_SECONDS = 30.0
+
+# Au-delà de cette taille de corpus, la matrice d'embeddings n'est plus
+# gardée en RAM et la recherche sémantique repasse par l'index HNSW de Chroma
+_IN_MEMORY_CORPUS_MAX = 50000
+
+# Tokenisation BM25: mots de 2 caractères et plus, accents inclus
+_BM25_TOKEN_RE = re.compile(r"\w{2,}")
+
+
+def _token_signature(tokens) -> int:
+    """Signature 64 bits d'un jeu de tokens (un bit par hash modulo 64).
+
+    Deux jeux sans bit commun n'ont aucun token commun: un AND binaire
+    nul permet donc de sauter l'intersection exacte des sets lors du
+    re-ranking (jamais de faux négatif, seulement des collisions).
+    """
+    sig = 0
+    for tok in tokens:
+        sig |= 1 << (hash(tok) & 63)
+    return sig
+
+
+class _BM25Index:
+    """Index BM25 Okapi en mémoire sur les chunks de la collection.
+
+    Construit une fois à partir du contenu de ChromaDB puis invalidé à
+    chaque (ré)indexation; le scoring d'une requête devient quelques
+    opérations NumPy sur les postings au lieu d'une boucle Python qui
+    re-tokenise tout le corpus à chaque recherche.
+    """
+
+    def __init__(self, docs: List[str], metas: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.docs = docs
+        self.metas = metas
+        self.k1 = k1
+        self.b = b
+
+        n_docs = len(docs)
+        doc_len = np.zeros(n_docs, dtype=np.float32)
+        # terme -> listes (indices de documents, fréquences)
+        postings: Dict[str, Tuple[list, list]] = {}
+
+        token_sets: List[frozenset] = []
+        signatures: List[int] = []
+        for idx, doc in enumerate(docs):
+            tokens = _BM25_TOKEN_RE.findall(doc.lower())
+            doc_len[idx] = len(tokens)
+            counts: Dict[str, int] = {}
+            for tok in tokens:
+                counts[tok] = counts.get(tok, 0) + 1
+            token_set = frozenset(counts)
+            token_sets.append(token_set)
+            signatures.append(_token_signature(token_set))
+            for tok, tf in counts.items():
+                entry = postings.setdefault(tok, ([], []))
+                entry[0].append(idx)
+                entry[1].append(tf)
+
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.mean()) if n_docs else 1.0
+        # Jeux de tokens par document, réutilisés par le re-ranking pour
+        # éviter de re-tokeniser le contenu à chaque requête
+        self.token_sets: List[frozenset] = token_sets
+        # Signatures 64 bits alignées sur token_sets (pré-filtre du re-ranking)
+        self.signatures: List[int] = signatures
+        self.postings = {
+            tok: (np.asarray(idxs, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for tok, (idxs, tfs) in postings.items()
+        }
+        # IDF Okapi avec le lissage +1 habituel
+        self.idf = {
+            tok: float(np.log((n_docs - len(idxs) + 0.5) / (len(idxs) + 0.5) + 1.0))
+            for tok, (idxs, _) in self.postings.items()
+        }
+
+    def search(self, query_tokens: List[str], top_k: int) -> List[Tuple[int, float]]:
+        """Retourner [(index de document, score)] trié par score décroissant"""
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+
+        for tok in set(query_tokens):
+            posting = self.postings.get(tok)
+            if posting is None:
+                continue
+            idxs, tfs = posting
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[idxs] / self.avgdl)
+            scores[idxs] += self.idf[tok] * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+        if not scores.any():
+            return []
+
+        top_k = min(top_k, len(self.docs))
+        top = np.argpartition(scores, -top_k)[-top_k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0.0]
+
+
+def _too_short(text: str, min_len: int) -> bool:
+    """Vrai si le texte, une fois nettoyé, fait moins de min_len caractères.
+
+    len() sert de borne inférieure gratuite; la copie allouée par strip()
+    n'est payée que si le texte commence ou finit par du blanc.
+    """
+    if len(text) < min_len:
+        return True
+    if text[0].isspace() or text[-1].isspace():
+        return len(text.strip()) < min_len
+    return False
+
+
+class EmbeddingBatcher:
+    """Micro-batching adaptatif des appels encode().
+
+    Les uploads concurrents soumettent leurs textes dans une file partagée;
+    le batch est envoyé au modèle quand il atteint max_batch ou après
+    max_wait secondes. Si un batch est déjà en cours d'encodage, le flush
+    est différé pour laisser la file se remplir (règle adaptative), ce qui
+    amortit le coût du forward-pass sur plusieurs documents en vol.
+    """
+
+    def __init__(self, encode_fn, executor, max_batch: int = 32, max_wait: float = 0.02):
+        self._encode_fn = encode_fn
+        self._executor = executor
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._pending = []  # liste de (texte, future)
+        self._flush_task = None
+        self._in_flight = 0
+
+    async def submit(self, text: str) -> np.ndarray:
+        """Soumettre un texte et attendre son embedding (vecteur float32)"""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self._max_batch:
+            self._flush_now()
+        elif self._flush_task is None:
+            self._flush_task = loop.create_task(self._delayed_flush())
+
+        return await future
+
+    async def submit_many(self, texts: List[str]) -> List[np.ndarray]:
+        """Soumettre plusieurs textes en conservant l'ordre"""
+        return list(await asyncio.gather(*(self.submit(text) for text in texts)))
+
+    def _flush_now(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        batch = self._pending
+        self._pending = []
+        if batch:
+            asyncio.get_event_loop().create_task(self._run_batch(batch))
+
+    async def _delayed_flush(self):
+        try:
+            await asyncio.sleep(self._max_wait)
+            # Règle adaptative: un encodage est déjà en vol, différer le flush
+            # tant que la file n'est pas pleine
+            while self._in_flight > 0 and len(self._pending) < self._max_batch:
+                await asyncio.sleep(self._max_wait)
+        except asyncio.CancelledError:
+            return
+
+        self._flush_task = None
+        batch = self._pending
+        self._pending = []
+        if batch:
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch):
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_event_loop()
+            texts = [text for text, _ in batch]
+            embeddings = await loop.run_in_executor(self._executor, self._encode_fn, texts)
+
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    # Ligne float32 de la matrice encodée: pas de .tolist(),
+                    # le boxing de 384 floats Python par chunk est évité
+                    future.set_result(embedding)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._in_flight -= 1
+
+
+# Cross-encoders de re-ranking partagés au niveau du process, clé = nom de
+# modèle; les modèles en échec y sont aussi mémorisés pour ne jamais
+# retenter un chargement coûteux, même si des instances du service sont
+# recréées au fil des requêtes
+_reranker_lock = threading.Lock()
+_reranker_cache: Dict[str, Any] = {}
+_reranker_failed_models: set = set()
+
 
 class EmbeddingService:
     def __init__(self):
@@ -23,8 +443,50 @@ class EmbeddingService:
         self.chroma_client = None
         self.collection = None
         self.executor = None
+        self.io_executor = None
+        self.cpu_executor = None
+        self.batcher = None
         self.text_processor = TextProcessor()
-        
+
+        # Cache persistant des embeddings, clé sha256(modèle + texte)
+        self._cache_conn = None
+        self._cache_lock = threading.Lock()
+
+        # Index BM25 en mémoire pour la recherche mots-clés (invalidé à
+        # chaque écriture dans la collection)
+        self._bm25_index = None
+
+        # LRU des embeddings de requêtes: les questions répétées (relances,
+        # reformulations identiques) ne repassent pas par le modèle
+        self._query_emb_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        # Alias de personnes (prénom, nom, nom complet normalisé) -> noms
+        # normalisés stockés, alimenté à l'ingestion pour filtrer par $in
+        self._person_alias_map: Dict[str, set] = {}
+
+        # Statistiques de collection mises en cache avec TTL (l'échantillon
+        # de 100 documents n'est plus relu à chaque appel)
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+
+        # Tokens par chunk_id (issus de l'index BM25), consommés par le
+        # re-ranking heuristique au lieu de re-tokeniser chaque contenu
+        self._chunk_tokens: Dict[str, frozenset] = {}
+        # Signatures 64 bits associées, pour écarter sans intersection les
+        # chunks sans aucun token commun avec la requête
+        self._chunk_sigs: Dict[str, int] = {}
+
+        # Matrice d'embeddings du corpus (float32, lignes normalisées):
+        # pour les petits corpus, un produit matrice-vecteur bat le coût
+        # fixe d'une requête HNSW ChromaDB
+        self._corpus_matrix: Optional[np.ndarray] = None
+        self._corpus_docs: List[str] = []
+        self._corpus_metas: List[Dict[str, Any]] = []
+        self._index_build_lock = threading.Lock()
+
+        # Positionné en fin d'initialize(): permet à get_embedding_service()
+        # de réutiliser l'instance sans la ré-initialiser
+        self._initialized = False
+
         self.chroma_settings = Settings(
             persist_directory=settings.CHROMADB_PERSIST_DIRECTORY,
             anonymized_telemetry=False
@@ -32,10 +494,64 @@ class EmbeddingService:
     
     async def initialize(self):
         try:
-            logger.info(f"Chargement du modèle d'embeddings: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-            
-            self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embedding")
+            # Certains environnements démarrent torch avec un seul thread
+            # intra-op: le forward-pass encode n'utilise alors qu'un coeur
+            try:
+                import torch
+                num_threads = getattr(settings, 'EMBEDDING_NUM_THREADS', 0) or (os.cpu_count() or 1)
+                torch.set_num_threads(num_threads)
+                logger.info(f"Threads intra-op torch: {num_threads}")
+            except Exception as e:
+                logger.warning(f"Configuration des threads torch impossible: {e}")
+
+            backend = getattr(settings, 'EMBEDDING_BACKEND', 'torch')
+            logger.info(f"Chargement du modèle d'embeddings: {self.model_name} (backend: {backend})")
+
+            # Avec le backend onnx, EMBEDDING_ONNX_FILE permet de pointer un
+            # export quantizé int8 (GEMM int8/VNNI, ~2x le débit CPU) au
+            # lieu de l'export FP32 par défaut
+            model_kwargs = {}
+            onnx_file = getattr(settings, 'EMBEDDING_ONNX_FILE', '')
+            if backend == 'onnx' and onnx_file:
+                model_kwargs["file_name"] = onnx_file
+                logger.info(f"Fichier ONNX sélectionné: {onnx_file}")
+
+            try:
+                # backend="onnx" (sentence-transformers >= 3.2): export ONNX
+                # automatique + exécution ONNX Runtime, mêmes embeddings
+                self.model = SentenceTransformer(
+                    self.model_name, backend=backend,
+                    model_kwargs=model_kwargs or None
+                )
+            except TypeError:
+                # Version plus ancienne sans paramètre backend
+                logger.warning("Paramètre backend non supporté, chargement torch classique")
+                self.model = SentenceTransformer(self.model_name)
+
+            # FP16 sur GPU: moitié moins d'octets lus par la DRAM et accès
+            # aux tensor cores; la similarité cosinus y est insensible
+            if backend == 'torch':
+                try:
+                    import torch
+                    if torch.cuda.is_available():
+                        self.model.half()
+                        logger.info("Modèle d'embeddings converti en FP16 (GPU)")
+                except Exception as e:
+                    logger.warning(f"Conversion FP16 impossible: {e}")
+            
+            # Un seul worker encode (le parallélisme vient des threads BLAS
+            # intra-op, plusieurs workers se disputeraient les coeurs) et un
+            # pool séparé pour les écritures ChromaDB
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+            self.io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chroma-io")
+            # Pool dédié à la construction des chunks (extraction, regex,
+            # enrichissement): ce travail CPU ne bloque plus l'event loop
+            self.cpu_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chunking")
+            self.batcher = EmbeddingBatcher(self._generate_embeddings_sync, self.executor)
+
+            # Cache persistant: ré-indexer un contenu inchangé ne repasse
+            # plus par le forward-pass du modèle
+            self._init_embedding_cache()
             
             logger.info("Initialisation de ChromaDB")
             self.chroma_client = chromadb.PersistentClient(
@@ -47,8 +563,9 @@ class EmbeddingService:
             stats = await self.get_collection_stats()
             logger.info(f"Collection stats après initialisation: {stats}")
             
+            self._initialized = True
             logger.info("Service d'embeddings initialisé avec succès")
-            
+
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation du service d'embeddings: {e}")
             raise
@@ -57,13 +574,49 @@ class EmbeddingService:
         if self.executor:
             self.executor.shutdown(wait=False)
             self.executor = None
+        if self.io_executor:
+            self.io_executor.shutdown(wait=False)
+            self.io_executor = None
+        if self.cpu_executor:
+            self.cpu_executor.shutdown(wait=False)
+            self.cpu_executor = None
+        self.batcher = None
+        if self._cache_conn is not None:
+            try:
+                self._cache_conn.close()
+            except Exception:
+                pass
+            self._cache_conn = None
+        self._initialized = False
         logger.info("Service d'embeddings nettoyé")
+
+    def _init_embedding_cache(self):
+        """Ouvrir (ou créer) le cache SQLite des embeddings"""
+        try:
+            cache_path = os.path.join(settings.CHROMADB_PERSIST_DIRECTORY, "embedding_cache.db")
+            os.makedirs(settings.CHROMADB_PERSIST_DIRECTORY, exist_ok=True)
+            self._cache_conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self._cache_conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache (hash BLOB PRIMARY KEY, vec BLOB)"
+            )
+            self._cache_conn.commit()
+            logger.info(f"Cache d'embeddings ouvert: {cache_path}")
+        except Exception as e:
+            logger.warning(f"Cache d'embeddings indisponible: {e}")
+            self._cache_conn = None
     
     async def _get_or_create_collection(self):
         try:
+            # hnsw:space aligné sur CHROMADB_DISTANCE_METRIC: avec des
+            # vecteurs normalisés, la distance cosinus est un simple produit
+            # scalaire fusionné (pas de sqrt/division par requête). Ne
+            # s'applique qu'aux collections créées à partir d'ici.
             collection = self.chroma_client.get_or_create_collection(
                 name=settings.CHROMADB_COLLECTION_NAME,
-                metadata={"description": "FAQ Documents Embeddings"}
+                metadata={
+                    "description": "FAQ Documents Embeddings",
+                    "hnsw:space": getattr(settings, 'CHROMADB_DISTANCE_METRIC', 'cosine')
+                }
             )
             
             logger.info(f"Collection ChromaDB '{settings.CHROMADB_COLLECTION_NAME}' prête")
@@ -76,55 +629,44 @@ class EmbeddingService:
     def _prepare_chromadb_metadata(self, metadata_dict: Dict[str, Any]) -> Dict[str, Any]:
         """Nettoyer les métadonnées pour ChromaDB avec meilleure isolation"""
         clean_metadata = {}
-        
+
         for key, value in metadata_dict.items():
-            if value is None:
-                clean_metadata[key] = ""
-            elif isinstance(value, dict):
+            if isinstance(value, dict):
                 # Aplatir les dictionnaires
                 for sub_key, sub_value in value.items():
                     new_key = f"{key}_{sub_key}"
                     clean_metadata[new_key] = str(sub_value) if sub_value is not None else ""
-            elif isinstance(value, (str, int, float, bool)):
-                clean_metadata[key] = value
-            elif isinstance(value, list):
-                clean_metadata[key] = ", ".join(str(item) for item in value if item)
-            else:
-                clean_metadata[key] = str(value)
-        
+                continue
+
+            converter = _META_CONVERTERS.get(type(value))
+            clean_metadata[key] = converter(value) if converter is not None else str(value)
+
         return clean_metadata
     
-    async def generate_embedding(self, text: str) -> List[float]:
+    async def generate_embedding(self, text: str, *, already_clean: bool = False) -> np.ndarray:
         try:
             if not self.executor:
                 raise RuntimeError("EmbeddingService non initialisé")
-            
+
             if not text or not text.strip():
                 logger.warning("Texte vide fourni pour embedding")
-                return []
-            
-            cleaned_text = self.text_processor.clean_text(text)
-            
+                return np.empty(0, dtype=np.float32)
+
+            # already_clean: l'appelant a déjà normalisé le texte, inutile
+            # de repayer les passes regex de clean_text
+            cleaned_text = text if already_clean else self.text_processor.clean_text(text)
+
             if not cleaned_text or len(cleaned_text.strip()) < 3:
                 logger.warning(f"Texte trop court après nettoyage: '{cleaned_text}'")
-                return []
-            
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                self.executor, 
-                self._generate_embedding_sync, 
-                cleaned_text
-            )
+                return np.empty(0, dtype=np.float32)
             
-            return embedding.tolist()
+            # Passe par le batcher partagé pour profiter du micro-batching
+            return await self.batcher.submit(cleaned_text)
             
         except Exception as e:
             logger.error(f"Erreur lors de la génération de l'embedding: {e}")
             raise
     
-    def _generate_embedding_sync(self, text: str) -> np.ndarray:
-        return self.model.encode([text], convert_to_numpy=True)[0]
-    
     # *** AMÉLIORATION MAJEURE : Meilleure isolation des documents ***
     async def index_document(
         self, 
@@ -138,102 +680,170 @@ class EmbeddingService:
                 return False
             
             logger.info(f"🔄 Indexation document {document_id} - Taille: {len(content)} caractères")
-            
-            # *** FIX CRITIQUE : Supprimer TOUS les anciens chunks de ce document ***
-            try:
-                # Utiliser document_id exact pour éviter les fuites entre documents
-                self.collection.delete(where={"document_id": {"$eq": str(document_id)}})
-                logger.info(f"🗑️ Tous les anciens chunks du document {document_id} supprimés")
-            except Exception as e:
-                logger.warning(f"Erreur suppression anciens chunks: {e}")
-            
+
+            loop = asyncio.get_event_loop()
+
             # *** AMÉLIORATION : Extraction plus précise des informations personnelles ***
-            person_info = self._extract_person_information(content, metadata)
+            # Déportée dans le pool chunking: les passes regex sur le contenu
+            # entier ne bloquent pas l'event loop
+            person_info = await loop.run_in_executor(
+                self.cpu_executor, self._extract_person_information, content, metadata
+            )
             logger.info(f"👤 Informations de la personne détectées: {person_info.get('name', 'Non détecté')}")
-            
-            # Chunking intelligent avec isolation renforcée
-            chunks = self._create_isolated_chunks(content, metadata, person_info, document_id)
+            self._register_person_aliases(person_info)
+
+            # Chunking intelligent avec isolation renforcée (CPU pur, même pool)
+            chunks = await loop.run_in_executor(
+                self.cpu_executor, self._create_isolated_chunks,
+                content, metadata, person_info, document_id
+            )
             
             if not chunks:
                 logger.warning(f"Aucun chunk généré pour {document_id}")
                 return False
             
             logger.info(f"📄 Document {document_id} divisé en {len(chunks)} chunks isolés")
-            
-            # Générer les embeddings avec préfixes d'isolation
-            chunk_texts = []
-            chunk_metadata = []
-            chunk_ids = []
-            
+
+            # Filtrer avant d'énumérer: les index restent denses (0..n-1),
+            # condition nécessaire pour la purge des chunks périmés ci-dessous
+            chunks = [c for c in chunks if c["text"].strip()]
+
+            # Listes pré-dimensionnées: pas de redimensionnements append par append
+            n_chunks = len(chunks)
+            chunk_ids: List[str] = [None] * n_chunks
+            chunk_texts: List[str] = [None] * n_chunks
+            chunk_metadata: List[Dict[str, Any]] = [None] * n_chunks
+
+            # Un seul relevé d'horloge pour tout le document (les chunks
+            # d'une même indexation partagent le même timestamp)
+            ts_iso = datetime.now().isoformat()
+            person_display = person_info.get("name", "personne inconnue")
+
+            # *** CHAMPS D'ISOLATION CONSTANTS PAR DOCUMENT ***
+            # Construits une seule fois puis dépliés dans chaque dict de
+            # chunk, au lieu de recalculer ~8 entrées identiques par chunk
+            base_doc_meta = {
+                "document_id": str(document_id),
+                "person_name": person_info.get("name", ""),
+                "person_name_normalized": person_info.get("name_normalized", ""),
+                "person_email": person_info.get("email", ""),
+                "person_phone": person_info.get("phone", ""),
+                "document_type": person_info.get("document_type", "cv"),
+                "isolation_key": f"{document_id}_{person_info.get('name_normalized', 'unknown')}",
+                # blake2b plutôt que hash() builtin: stable entre redémarrages
+                # (hash() est randomisé par PYTHONHASHSEED, la signature
+                # stockée différait donc d'un processus à l'autre)
+                "unique_document_signature": f"{document_id}_{hashlib.blake2b(content[:4096].encode('utf-8', 'ignore'), digest_size=4).hexdigest()}"
+            }
+
+            # Métadonnées personnalisées: constantes par document, nettoyées une fois
+            if metadata:
+                try:
+                    base_doc_meta.update(self._prepare_chromadb_metadata(metadata))
+                except Exception as e:
+                    logger.warning(f"Erreur métadonnées personnalisées: {e}")
+
             for i, chunk_data in enumerate(chunks):
-                if not chunk_data["text"].strip():
-                    continue
-                    
-                # *** FIX : ID unique plus robuste ***
-                chunk_id = f"{document_id}_chunk_{i}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                chunk_ids.append(chunk_id)
-                chunk_texts.append(chunk_data["text"])
-                
-                # *** MÉTADONNÉES ENRICHIES AVEC ISOLATION FORTE ***
-                base_meta = {
-                    "document_id": str(document_id),
+                # ID déterministe: permet l'upsert idempotent (pas de
+                # suffixe horodaté, sinon chaque ré-indexation duplique)
+                chunk_id = f"{document_id}_chunk_{i}"
+                chunk_ids[i] = chunk_id
+                chunk_texts[i] = chunk_data["text"]
+
+                original_text = chunk_data["original_text"]
+                chunk_metadata[i] = {
+                    **base_doc_meta,
                     "chunk_id": chunk_id,
                     "chunk_index": int(i),
-                    "chunk_size": int(len(chunk_data["original_text"])),
-                    "timestamp": datetime.now().isoformat(),
+                    "chunk_size": len(original_text),
+                    "timestamp": ts_iso,
                     "chunk_type": chunk_data["chunk_type"],
                     "section_title": chunk_data.get("section_title", ""),
                     "keywords": ", ".join(chunk_data["keywords"][:10]),
-                    "content_preview": chunk_data["original_text"][:200] + "..." if len(chunk_data["original_text"]) > 200 else chunk_data["original_text"],
-                    
-                    # *** NOUVEAUX CHAMPS D'ISOLATION ***
-                    "person_name": person_info.get("name", ""),
-                    "person_name_normalized": person_info.get("name_normalized", ""),
-                    "person_email": person_info.get("email", ""),
-                    "person_phone": person_info.get("phone", ""),
-                    "document_type": person_info.get("document_type", "cv"),
-                    "isolation_key": f"{document_id}_{person_info.get('name_normalized', 'unknown')}",
-                    
-                    # Contexte renforcé
-                    "document_context": f"Document de {person_info.get('name', 'personne inconnue')} - {chunk_data['chunk_type']}",
-                    "unique_document_signature": f"{document_id}_{hash(content[:500]) % 10000}"
+                    # Pas de content_preview: le texte est déjà dans le champ
+                    # documents de Chroma, le dupliquer dans les métadonnées
+                    # alourdissait chaque ligne et chaque réponse de requête
+                    "document_context": f"Document de {person_display} - {chunk_data['chunk_type']}"
                 }
-                
-                # Ajouter métadonnées personnalisées si disponibles
-                if metadata:
-                    try:
-                        clean_custom_metadata = self._prepare_chromadb_metadata(metadata)
-                        base_meta.update(clean_custom_metadata)
-                    except Exception as e:
-                        logger.warning(f"Erreur métadonnées personnalisées: {e}")
-                
-                chunk_metadata.append(base_meta)
             
             if not chunk_texts:
                 logger.warning(f"Aucun chunk valide après filtrage pour {document_id}")
                 return False
             
-            # Générer embeddings
-            try:
-                embeddings = await self._generate_embeddings_batch(chunk_texts)
-                if not embeddings or len(embeddings) != len(chunk_texts):
-                    logger.error(f"Erreur génération embeddings: {len(embeddings)} vs {len(chunk_texts)}")
-                    return False
-            except Exception as e:
-                logger.error(f"Erreur génération embeddings batch: {e}")
-                return False
-            
-            # Stocker dans ChromaDB
+            # Pipeline encode / écriture: l'upsert ChromaDB (disque) du lot i
+            # part dans l'exécuteur I/O pendant que l'encodage du lot i+1
+            # tourne, au lieu de bloquer la boucle sur chaque étape
+            quantize = getattr(settings, 'EMBED_QUANTIZATION', 'none') == 'int8'
+            pending_write = None
+
             try:
-                self.collection.add(
-                    ids=chunk_ids,
-                    embeddings=embeddings,
-                    documents=chunk_texts,
-                    metadatas=chunk_metadata
-                )
+                for start in range(0, len(chunk_texts), _CHROMA_SUB_BATCH):
+                    texts_b = chunk_texts[start:start + _CHROMA_SUB_BATCH]
+                    ids_b = chunk_ids[start:start + _CHROMA_SUB_BATCH]
+                    metas_b = chunk_metadata[start:start + _CHROMA_SUB_BATCH]
+
+                    # already_clean: les chunks sortent du pipeline de
+                    # chunking, le re-nettoyage par texte est redondant
+                    embeddings = await self._generate_embeddings_batch(texts_b, already_clean=True)
+                    if embeddings is None or len(embeddings) != len(texts_b):
+                        logger.error(f"Erreur génération embeddings: {len(embeddings)} vs {len(texts_b)}")
+                        return False
+
+                    # Quantization int8 optionnelle avant persistance
+                    if quantize:
+                        embeddings, scales = self._quantize_int8(embeddings)
+                        for meta, scale in zip(metas_b, scales):
+                            meta["embedding_scale"] = float(scale)
+
+                    # Attendre l'écriture précédente avant d'en lancer une autre
+                    if pending_write is not None:
+                        await pending_write
+
+                    pending_write = loop.run_in_executor(
+                        self.io_executor,
+                        lambda ids=ids_b, emb=embeddings, docs=texts_b, metas=metas_b:
+                            self.collection.upsert(
+                                ids=ids, embeddings=emb,
+                                documents=docs, metadatas=metas
+                            )
+                    )
+
+                if pending_write is not None:
+                    await pending_write
+
+                # Purger les chunks périmés: tout ID du document absent du
+                # nouveau jeu d'IDs déterministes (ancienne version plus
+                # longue, mais aussi IDs horodatés de l'ancien schéma
+                # {doc}_chunk_{i}_{ts} que l'upsert ne remplace pas)
+                try:
+                    existing = await loop.run_in_executor(
+                        self.io_executor,
+                        lambda: self.collection.get(
+                            where={"document_id": {"$eq": str(document_id)}},
+                            include=[]
+                        )
+                    )
+                    fresh_ids = set(chunk_ids)
+                    stale_ids = [
+                        cid for cid in existing.get("ids", [])
+                        if cid not in fresh_ids
+                    ]
+                    if stale_ids:
+                        await loop.run_in_executor(
+                            self.io_executor,
+                            lambda: self.collection.delete(ids=stale_ids)
+                        )
+                        logger.info(f"Purge de {len(stale_ids)} chunks périmés pour {document_id}")
+                except Exception as e:
+                    logger.warning(f"Erreur purge des chunks périmés: {e}")
+
+                # Le corpus a changé: invalider les index en mémoire et
+                # relancer leur construction en arrière-plan
+                self._invalidate_corpus_indexes()
+
                 logger.info(f"✅ Document {document_id} indexé avec {len(chunks)} chunks isolés")
                 return True
-                
+
             except Exception as e:
                 logger.error(f"Erreur stockage ChromaDB pour {document_id}: {e}")
                 return False
@@ -244,6 +854,17 @@ class EmbeddingService:
             logger.error(traceback.format_exc())
             return False
     
+    async def delete_document(self, document_id: str) -> bool:
+        """Supprimer tous les chunks d'un document de la collection"""
+        try:
+            self.collection.delete(where={"document_id": {"$eq": str(document_id)}})
+            self._invalidate_corpus_indexes()
+            logger.info(f"🗑️ Chunks du document {document_id} supprimés de ChromaDB")
+            return True
+        except Exception as e:
+            logger.error(f"Erreur suppression document {document_id}: {e}")
+            return False
+
     def _extract_person_information(self, content: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
         """*** NOUVEAU : Extraction précise des informations personnelles ***"""
         person_info = {"document_type": "cv"}
@@ -257,22 +878,14 @@ class EmbeddingService:
         
         # 2. Extraction du nom depuis le contenu si pas trouvé
         if not person_info.get("name"):
-            name_patterns = [
-                # Patterns plus robustes pour les noms
-                r'^\s*([A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][a-zàâäéèêëïîôöùûüÿç]+\s+[A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][a-zàâäéèêëïîôöùûüÿç]+(?:\s+[A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][a-zàâäéèêëïîôöùûüÿç]+)?)\s*$',
-                r'Nom\s*:?\s*([A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][a-zàâäéèêëïîôöùûüÿç]+(?:\s+[A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][a-zàâäéèêëïîôöùûüÿç]+)+)',
-                r'([A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][a-zàâäéèêëïîôöùûüÿç]+\s+[A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][a-zàâäéèêëïîôöùûüÿç]+)\s*\n.*(?:Ingénieur|Développeur|Étudiant)',
-                r'^([A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ]{2,}\s+[A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ]{2,})\s*$'
-            ]
-            
             lines = content.split('\n')[:15]  # Chercher dans les 15 premières lignes
             for line in lines:
                 line = line.strip()
                 if not line or len(line) < 5 or len(line) > 60:
                     continue
-                    
-                for pattern in name_patterns:
-                    match = re.search(pattern, line, re.MULTILINE)
+
+                for pattern in _NAME_PATTERNS:
+                    match = pattern.search(line)
                     if match:
                         potential_name = match.group(1).strip()
                         # Valider que c'est bien un nom
@@ -287,23 +900,15 @@ class EmbeddingService:
         
         # 3. Normaliser le nom pour l'isolation
         if person_info.get("name"):
-            normalized_name = re.sub(r'[^a-zA-Z\s]', '', person_info["name"].lower())
-            normalized_name = re.sub(r'\s+', '_', normalized_name.strip())
-            person_info["name_normalized"] = normalized_name
+            person_info["name_normalized"] = _normalize_person_name(person_info["name"])
         
         # 4. Extraire email et téléphone
-        email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', content)
+        email_match = _EMAIL_PATTERN.search(content)
         if email_match:
             person_info["email"] = email_match.group()
-        
-        phone_patterns = [
-            r'(?:\+33|0)[1-9](?:[0-9]{8})',
-            r'(?:\+212|0)[5-7][0-9]{8}',
-            r'\b\d{2}[-\s]?\d{2}[-\s]?\d{2}[-\s]?\d{2}[-\s]?\d{2}\b'
-        ]
-        
-        for pattern in phone_patterns:
-            phone_match = re.search(pattern, content)
+
+        for pattern in _PHONE_PATTERNS:
+            phone_match = pattern.search(content)
             if phone_match:
                 person_info["phone"] = phone_match.group()
                 break
@@ -326,14 +931,23 @@ class EmbeddingService:
             
             # 2. Créer un préfixe d'isolation unique pour ce document
             isolation_prefix = self._create_isolation_prefix(person_info, document_id)
-            
+
+            # Fragments constants par document, assemblés une seule fois
+            person_name = person_info.get("name", "PERSONNE_INCONNUE") or "PERSONNE_INCONNUE"
+            template = _IsolationTemplate(
+                header=f"{isolation_prefix}\n",
+                candidate=f"CANDIDAT: {person_info['name']}" if person_info.get("name") else "CANDIDAT: PERSONNE_INCONNUE",
+                open_tag=f"--- CONTENU DE {person_name} ---\n",
+                close_tag=f"\n--- FIN CONTENU {person_name} ---"
+            )
+
             if sections:
                 logger.info(f"📑 Sections détectées: {[s['title'] for s in sections]}")
                 
                 # Traiter chaque section avec isolation
                 for section in sections:
                     section_chunks = self._chunk_section_with_isolation(
-                        section, person_info, metadata, isolation_prefix
+                        section, person_info, metadata, isolation_prefix, template
                     )
                     chunks.extend(section_chunks)
             else:
@@ -346,7 +960,7 @@ class EmbeddingService:
                 )
                 
                 for i, chunk_text in enumerate(basic_chunks):
-                    if len(chunk_text.strip()) < 20:
+                    if _too_short(chunk_text, 20):
                         continue
                         
                     keywords = self._extract_keywords(chunk_text)
@@ -354,7 +968,7 @@ class EmbeddingService:
                     
                     # *** Enrichir avec isolation forte ***
                     enriched_text = self._enrich_chunk_with_isolation(
-                        chunk_text, person_info, keywords, chunk_type, isolation_prefix, ""
+                        chunk_text, template, keywords, chunk_type, ""
                     )
                     
                     chunks.append({
@@ -384,7 +998,7 @@ class EmbeddingService:
                     "section_title": "",
                     "person_info": person_info,
                     "isolation_prefix": isolation_prefix
-                } for chunk in basic_chunks if len(chunk.strip()) > 10]
+                } for chunk in basic_chunks if not _too_short(chunk, 11)]
             except:
                 return []
     
@@ -401,11 +1015,12 @@ class EmbeddingService:
         return "[" + "|".join(prefix_parts) + "]"
     
     def _chunk_section_with_isolation(
-        self, 
-        section: Dict[str, Any], 
+        self,
+        section: Dict[str, Any],
         person_info: Dict[str, Any],
         metadata: Dict[str, Any],
-        isolation_prefix: str
+        isolation_prefix: str,
+        template: _IsolationTemplate
     ) -> List[Dict[str, Any]]:
         """*** NOUVEAU : Chunker une section avec isolation ***"""
         chunks = []
@@ -430,7 +1045,7 @@ class EmbeddingService:
         
         # Traiter chaque chunk de la section avec isolation
         for i, chunk_text in enumerate(section_chunks):
-            if len(chunk_text.strip()) < 15:
+            if _too_short(chunk_text, 15):
                 continue
             
             keywords = self._extract_keywords(chunk_text, section_title)
@@ -438,7 +1053,7 @@ class EmbeddingService:
             
             # *** Enrichir avec isolation de section ***
             enriched_text = self._enrich_chunk_with_isolation(
-                chunk_text, person_info, keywords, chunk_type, isolation_prefix, section_title
+                chunk_text, template, keywords, chunk_type, section_title
             )
             
             chunks.append({
@@ -454,96 +1069,73 @@ class EmbeddingService:
         return chunks
     
     def _enrich_chunk_with_isolation(
-        self, 
-        chunk: str, 
-        person_info: Dict[str, Any],
-        keywords: List[str], 
+        self,
+        chunk: str,
+        template: _IsolationTemplate,
+        keywords: List[str],
         chunk_type: str,
-        isolation_prefix: str,
         section_title: str = ""
     ) -> str:
-        """*** NOUVEAU : Enrichir un chunk avec isolation forte ***"""
-        
-        # Construire le préfixe de contexte avec isolation
-        context_parts = []
-        
+        """*** NOUVEAU : Enrichir un chunk avec isolation forte ***
+
+        Les fragments constants par document (en-tête, balises de contenu,
+        mention du candidat) viennent du template assemblé une seule fois
+        dans _create_isolated_chunks; seul l'en-tête de contexte dépend du
+        chunk.
+        """
         # *** ISOLATION FORTE : Toujours mentionner la personne ***
-        if person_info.get("name"):
-            context_parts.append(f"CANDIDAT: {person_info['name']}")
-        else:
-            context_parts.append("CANDIDAT: PERSONNE_INCONNUE")
-        
+        context_parts = [template.candidate]
+
         # Section actuelle
         if section_title:
             context_parts.append(f"SECTION: {section_title}")
-        
+
         # Type de contenu
-        type_labels = {
-            "education": "FORMATION_ET_EDUCATION",
-            "experience": "EXPERIENCE_PROFESSIONNELLE", 
-            "project": "PROJETS_ET_REALISATIONS",
-            "skills": "COMPETENCES_ET_EXPERTISE",
-            "certification": "CERTIFICATIONS_ET_DIPLOMES",
-            "contact": "INFORMATIONS_CONTACT",
-            "languages": "LANGUES",
-            "personal_info": "INFORMATIONS_PERSONNELLES",
-            "general": "INFORMATIONS_GENERALES"
-        }
-        
-        if chunk_type in type_labels:
-            context_parts.append(f"TYPE: {type_labels[chunk_type]}")
-        
+        type_label = _TYPE_LABELS.get(chunk_type)
+        if type_label:
+            context_parts.append(f"TYPE: {type_label}")
+
         # Mots-clés principaux
         if keywords:
-            main_keywords = keywords[:5]
-            context_parts.append(f"MOTS_CLES: {', '.join(main_keywords)}")
-        
-        # *** CONSTRUIRE LE TEXTE AVEC ISOLATION MAXIMALE ***
-        isolation_header = f"{isolation_prefix}\n"
+            context_parts.append(f"MOTS_CLES: {', '.join(keywords[:5])}")
+
         context_header = "[" + " | ".join(context_parts) + "]\n"
-        
+
         # Le chunk final avec triple isolation
-        final_chunk = (
-            isolation_header +
+        return (
+            template.header +
             context_header +
-            f"--- CONTENU DE {person_info.get('name', 'PERSONNE_INCONNUE')} ---\n" +
+            template.open_tag +
             chunk +
-            f"\n--- FIN CONTENU {person_info.get('name', 'PERSONNE_INCONNUE')} ---"
+            template.close_tag
         )
-        
-        return final_chunk
     
     # *** MÉTHODES EXISTANTES GARDÉES ***
     def _detect_sections(self, content: str) -> List[Dict[str, Any]]:
         """Détecter les sections dans le document"""
         sections = []
-        
-        section_patterns = [
-            r'^([A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ\s]{3,50})(?:\s*:?\s*)?$',
-            r'^\s*([IVX]+[\.\)]\s+[A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][A-Za-zàâäéèêëïîôöùûüÿç\s]{5,50})',
-            r'^\s*([0-9]+[\.\)]\s+[A-ZÀÂÄÉÈÊËÏÎÔÖÙÛÜŸÇ][A-Za-zàâäéèêëïîôöùûüÿç\s]{5,50})',
-            r'^\s*(FORMATION|EXPÉRIENCE|COMPÉTENCES|PROJETS|CERTIFICATIONS|LANGUES|CONTACT|PROFIL|OBJECTIF|DIPLÔMES)S?\s*:?\s*$',
-            r'^\s*(Formation|Expérience|Compétences|Projets|Certifications|Langues|Contact|Profil|Objectif|Diplômes)s?\s*:?\s*$'
-        ]
-        
+
         lines = content.split('\n')
         current_section = {"title": "Introduction", "start": 0, "content": ""}
         
         for i, line in enumerate(lines):
+            # Ligne vide: inutile d'allouer la copie strip()
+            if not line:
+                continue
             line_stripped = line.strip()
             if not line_stripped:
                 continue
                 
             is_section_title = False
             section_title = None
-            
-            for pattern in section_patterns:
-                match = re.match(pattern, line_stripped, re.IGNORECASE)
+
+            # Gate bon marché: les titres de section sont courts
+            if len(line_stripped) <= _SECTION_TITLE_MAX_LEN:
+                match = _SECTION_TITLE_RE.match(line_stripped)
                 if match:
-                    section_title = match.group(1).strip()
-                    if 5 <= len(section_title) <= 50 and not re.search(r'\d{4}', section_title):
+                    section_title = next(g for g in match.groups() if g).strip()
+                    if 5 <= len(section_title) <= 50 and not _YEAR_RE.search(section_title):
                         is_section_title = True
-                        break
             
             if is_section_title and section_title:
                 if current_section["content"].strip():
@@ -568,42 +1160,22 @@ class EmbeddingService:
         return valid_sections
     
     def _extract_keywords(self, text: str, section_title: str = "") -> List[str]:
-        """Extraction des mots-clés"""
-        keywords = []
+        """Extraction des mots-clés en une seule passe sur le texte"""
         text_lower = text.lower()
-        
-        domain_keywords = {
-            'web': ['html', 'css', 'javascript', 'react', 'vue', 'angular', 'php', 'laravel', 'django', 'flask'],
-            'mobile': ['android', 'ios', 'react native', 'flutter', 'kotlin', 'swift'],
-            'data': ['python', 'r', 'machine learning', 'data science', 'ai', 'tensorflow', 'pytorch', 'pandas'],
-            'database': ['sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'nosql'],
-            'devops': ['docker', 'kubernetes', 'aws', 'azure', 'gcp', 'git', 'jenkins', 'ci/cd'],
-            'general': ['java', 'c++', 'c#', 'python', 'api', 'rest', 'microservices', 'agile', 'scrum']
-        }
-        
-        section_keywords = {
-            'formation': ['université', 'école', 'diplôme', 'master', 'licence', 'formation', 'étude'],
-            'expérience': ['stage', 'emploi', 'poste', 'entreprise', 'société', 'travail', 'mission'],
-            'projets': ['projet', 'développement', 'création', 'réalisation', 'conception', 'implémentation'],
-            'compétences': ['compétence', 'maîtrise', 'connaissance', 'expertise', 'skill', 'niveau'],
-            'certifications': ['certification', 'diplôme', 'titre', 'qualification', 'accréditation']
-        }
-        
-        # Chercher dans tous les domaines techniques
-        for domain, terms in domain_keywords.items():
-            for term in terms:
-                if term in text_lower:
-                    keywords.append(term)
-        
-        # Chercher les mots-clés spécifiques à la section
+
+        # Un scan unique pour tous les termes connus
+        found = set(_KEYWORD_SCAN_RE.findall(text_lower))
+
+        # Termes techniques, tous domaines confondus
+        keywords = found & _DOMAIN_TERM_SET
+
+        # Termes spécifiques à la section
         section_lower = section_title.lower()
-        for section_key, terms in section_keywords.items():
+        for section_key, terms in _SECTION_TERM_SETS.items():
             if section_key in section_lower:
-                for term in terms:
-                    if term in text_lower:
-                        keywords.append(term)
-        
-        return list(set(keywords))[:15]
+                keywords |= found & terms
+
+        return list(keywords)[:15]
     
     def _identify_chunk_type_from_section(self, section_title: str, text: str) -> str:
         """Identifier le type de chunk basé sur la section"""
@@ -628,99 +1200,231 @@ class EmbeddingService:
         return self._identify_chunk_type(text)
     
     def _identify_chunk_type(self, text: str) -> str:
-        """Identifier le type de contenu du chunk"""
-        text_lower = text.lower()
-        
-        patterns = {
-            'education': ['formation', 'diplôme', 'université', 'école', 'master', 'licence', 'baccalauréat', 'étude', 'cursus'],
-            'experience': ['stage', 'expérience', 'emploi', 'poste', 'entreprise', 'société', 'travail', 'mission', 'responsabilité'],
-            'project': ['projet', 'réalisation', 'développement', 'création', 'conception', 'implémentation', 'application', 'site web'],
-            'skills': ['compétence', 'skill', 'maîtrise', 'connaissance', 'expertise', 'niveau', 'langage', 'outil', 'technologie'],
-            'certification': ['certification', 'diplôme', 'titre', 'qualification', 'accréditation', 'attestation'],
-            'contact': ['contact', 'téléphone', 'email', 'adresse', 'linkedin', 'github', '@', 'mail'],
-            'languages': ['langue', 'anglais', 'français', 'espagnol', 'arabe', 'niveau', 'bilingue', 'courant'],
-            'personal_info': ['nom', 'âge', 'nationalité', 'situation', 'permis', 'véhicule']
+        """Identifier le type de contenu du chunk (un seul scan du texte)"""
+        found = set(_CHUNK_TYPE_SCAN_RE.findall(text.lower()))
+        if not found:
+            return "general"
+
+        # Score par type = nombre d'indicateurs présents (intersections
+        # d'ensembles sur le résultat du scan unique)
+        type_scores = {
+            chunk_type: len(found & terms)
+            for chunk_type, terms in _CHUNK_TYPE_TERM_SETS.items()
         }
-        
-        # Compter les correspondances pour chaque type
-        type_scores = {}
-        for chunk_type, keywords in patterns.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            if score > 0:
-                type_scores[chunk_type] = score
-        
-        # Retourner le type avec le meilleur score
-        if type_scores:
-            return max(type_scores, key=type_scores.get)
-        
+
+        best_type = max(type_scores, key=type_scores.get)
+        if type_scores[best_type] > 0:
+            return best_type
+
         return "general"
     
-    async def _generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
-        """Générer les embeddings par batch - VERSION OPTIMISÉE"""
+    async def _generate_embeddings_batch(self, texts: List[str], already_clean: bool = False) -> np.ndarray:
+        """Générer les embeddings par batch, matrice float32 (N, D).
+
+        Les vecteurs restent des np.ndarray de bout en bout: ChromaDB les
+        accepte tels quels, et on évite de boxer N x 384 floats Python.
+        """
         try:
             if not texts:
-                return []
-            
+                return np.empty((0, 0), dtype=np.float32)
+
             if not self.executor:
                 raise RuntimeError("EmbeddingService non initialisé")
-            
-            # Nettoyer et valider les textes
-            cleaned_texts = []
-            for text in texts:
-                cleaned = self.text_processor.clean_text(text)
-                if cleaned and len(cleaned.strip()) >= 3:
-                    cleaned_texts.append(cleaned)
-                else:
-                    # Ajouter un placeholder pour maintenir l'ordre
-                    cleaned_texts.append("contenu vide")
+
+            if already_clean:
+                # Textes déjà normalisés en amont (cas du chunking): le
+                # nettoyage par texte serait du travail redondant
+                cleaned_texts = texts
+            else:
+                # Nettoyage vectorisé: une passe regex sur le bloc entier
+                # au lieu d'une par texte, placeholder pour garder l'ordre
+                cleaned_texts = [
+                    cleaned if cleaned and len(cleaned) >= 3 else "contenu vide"
+                    for cleaned in self.text_processor.clean_many(texts)
+                ]
             
             if not cleaned_texts:
                 logger.warning("Aucun texte valide après nettoyage")
                 return []
             
-            loop = asyncio.get_event_loop()
-            embeddings = await loop.run_in_executor(
-                self.executor, 
-                self._generate_embeddings_sync, 
-                cleaned_texts
-            )
-            
+            # File partagée: les batches des uploads concurrents sont fusionnés
+            embeddings = await self.batcher.submit_many(cleaned_texts)
+
             logger.info(f"✅ Embeddings générés pour {len(cleaned_texts)} textes")
-            return embeddings.tolist()
+            return np.asarray(embeddings, dtype=np.float32)
             
         except Exception as e:
             logger.error(f"Erreur génération embeddings batch: {e}")
             raise
     
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Un seul appel encode() pour tout le batch.
+
+        Le coût fixe Python/tokenizer par appel est amorti sur le batch
+        entier, et le backend fait un seul gros matmul au lieu de N petits.
+        """
+        return self.model.encode(
+            texts,
+            batch_size=getattr(settings, 'EMBEDDING_BATCH_SIZE', 32),
+            convert_to_numpy=True,
+            # Vecteurs unitaires dès l'encodage (et donc dans le cache):
+            # la similarité cosinus se réduit à un produit scalaire
+            normalize_embeddings=getattr(settings, 'EMBEDDING_NORMALIZE', True),
+            show_progress_bar=False
+        )
+
     def _generate_embeddings_sync(self, texts: List[str]) -> np.ndarray:
-        """Version synchrone pour génération par batch"""
-        return self.model.encode(texts, convert_to_numpy=True)
+        """Version synchrone pour génération par batch.
+
+        Les textes déjà vus (même modèle, même contenu) sont servis depuis
+        le cache SQLite; seuls les manquants passent par model.encode, en
+        un seul appel, puis sont insérés en une transaction.
+        """
+        if self._cache_conn is None:
+            return self._encode_batch(texts)
+
+        hashes = [
+            hashlib.sha256((self.model_name + "|" + text).encode()).digest()
+            for text in texts
+        ]
+
+        cached: Dict[bytes, np.ndarray] = {}
+        unique_hashes = list(set(hashes))
+        try:
+            with self._cache_lock:
+                placeholders = ",".join("?" * len(unique_hashes))
+                rows = self._cache_conn.execute(
+                    f"SELECT hash, vec FROM embedding_cache WHERE hash IN ({placeholders})",
+                    unique_hashes
+                ).fetchall()
+            cached = {h: np.frombuffer(v, dtype=np.float32) for h, v in rows}
+        except Exception as e:
+            logger.warning(f"Lecture du cache d'embeddings échouée: {e}")
+
+        miss_indices = [i for i, h in enumerate(hashes) if h not in cached]
+        if miss_indices:
+            miss_texts = [texts[i] for i in miss_indices]
+            encoded = np.asarray(self._encode_batch(miss_texts), dtype=np.float32)
+            try:
+                with self._cache_lock:
+                    self._cache_conn.executemany(
+                        "INSERT OR IGNORE INTO embedding_cache (hash, vec) VALUES (?, ?)",
+                        [(hashes[i], encoded[j].tobytes()) for j, i in enumerate(miss_indices)]
+                    )
+                    self._cache_conn.commit()
+            except Exception as e:
+                logger.warning(f"Écriture du cache d'embeddings échouée: {e}")
+
+            for j, i in enumerate(miss_indices):
+                cached[hashes[i]] = encoded[j]
+
+        return np.stack([cached[h] for h in hashes])
+
+    def _get_reranker(self):
+        """Charger paresseusement le cross-encoder de re-ranking.
+
+        Le modèle est mis en cache au niveau du module: le chargement n'est
+        payé qu'une fois par process, et un échec (modèle absent, pas de
+        réseau) est mémorisé définitivement pour retomber sur l'heuristique
+        historique sans retenter à chaque requête.
+        """
+        model_name = getattr(settings, 'RERANKER_MODEL', '')
+        if not model_name or model_name in _reranker_failed_models:
+            return None
+
+        reranker = _reranker_cache.get(model_name)
+        if reranker is not None:
+            return reranker
+
+        with _reranker_lock:
+            if model_name in _reranker_cache:
+                return _reranker_cache[model_name]
+            if model_name in _reranker_failed_models:
+                return None
+
+            try:
+                from sentence_transformers import CrossEncoder
+                logger.info(f"Chargement du cross-encoder de re-ranking: {model_name}")
+                reranker = CrossEncoder(model_name)
+                _reranker_cache[model_name] = reranker
+                return reranker
+            except Exception as e:
+                logger.warning(f"Cross-encoder indisponible ({e}), re-ranking heuristique conservé")
+                _reranker_failed_models.add(model_name)
+                return None
+
+    def _cross_encoder_rerank(self, query: str, results: List[SearchResult]) -> Optional[List[SearchResult]]:
+        """Re-ranker les meilleurs candidats avec le cross-encoder.
+
+        Un seul forward-pass batché (query, contenu) remplace les boucles
+        Python d'intersections d'ensembles; les scores sont passés par une
+        sigmoïde pour rester comparables au seuil de similarité [0, 1].
+        Retourne None si le cross-encoder est indisponible.
+        """
+        reranker = self._get_reranker()
+        if reranker is None:
+            return None
+
+        top_n = getattr(settings, 'RERANK_TOP_N', 25)
+        candidates = results[:top_n]
+
+        scores = reranker.predict(
+            [(query, r["content"]) for r in candidates],
+            batch_size=32,
+            convert_to_numpy=True
+        )
+        scores = 1.0 / (1.0 + np.exp(-scores))
+
+        for result, score in zip(candidates, scores):
+            # Le score bi-encoder n'est pas mélangé au score cross-encoder,
+            # il est conservé à titre de diagnostic
+            result["bi_encoder_score"] = result["similarity_score"]
+            result["final_score"] = float(score)
+
+        candidates.sort(key=lambda x: x["final_score"], reverse=True)
+        return candidates + results[top_n:]
+
+    @staticmethod
+    def _quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Quantizer un lot de vecteurs sur la grille int8 (échelle par vecteur).
+
+        Les valeurs retournées restent des float32 (API ChromaDB) mais sont
+        arrondies sur 256 niveaux: la précision perdue est négligeable pour
+        la recherche cosinus et les vecteurs se compressent bien mieux.
+        Tout le lot est traité en une passe NumPy, sans retour par des
+        listes Python.
+        """
+        max_abs = np.max(np.abs(embeddings), axis=1)
+        scales = np.where(max_abs > 0.0, max_abs / 127.0, 1.0).astype(np.float32)
+        quantized = np.round(embeddings / scales[:, None]).astype(np.int8)
+        return quantized.astype(np.float32) * scales[:, None], scales
     
     # *** RECHERCHE AMÉLIORÉE AVEC ISOLATION STRICTE ***
     async def search_similar_documents(
         self, 
         query: str = None,
-        query_embedding: List[float] = None,
+        query_embedding: np.ndarray = None,
         top_k: int = 10,
         threshold: float = 0.1,
         filter_metadata: Dict[str, Any] = None,
         target_person: str = None,  # *** NOUVEAU : Paramètre pour cibler une personne ***
         enable_reranking: bool = True,
         enable_hybrid_search: bool = True
-    ) -> List[Dict[str, Any]]:
+    ) -> List[SearchResult]:
         
         try:
             logger.info(f"🔍 RECHERCHE AVEC ISOLATION pour: '{query if query else 'embedding direct'}")
             if target_person:
                 logger.info(f"🎯 Cible spécifique: {target_person}")
             
-            # Vérifier l'état de la collection
-            stats = await self.get_collection_stats()
-            if stats.get("total_chunks", 0) == 0:
+            # Vérifier l'état de la collection: un simple count() suffit,
+            # les stats complètes relisaient 100 documents par recherche
+            total_chunks = self.collection.count()
+            if total_chunks == 0:
                 logger.warning("⚠️ Collection vide !")
                 return []
-            
-            logger.info(f"📊 Collection: {stats['total_chunks']} chunks de {stats['unique_documents']} documents")
+
+            logger.info(f"📊 Collection: {total_chunks} chunks")
             
             # *** NOUVEAU : Construire les filtres d'isolation ***
             isolation_filters = self._build_isolation_filters(filter_metadata, target_person)
@@ -734,62 +1438,93 @@ class EmbeddingService:
                 # Enrichir la requête avec le nom de la personne ciblée si disponible
                 enhanced_query = self._enhance_query_with_person(query, target_person)
                 logger.info(f"🔧 Requête enrichie: '{enhanced_query}'")
-                
-                query_embedding = await self.generate_embedding(enhanced_query)
-                if not query_embedding:
-                    logger.error("Impossible de générer l'embedding pour la requête")
-                    return []
+
+                # LRU sur le hash de la requête enrichie: une question déjà
+                # vue court-circuite entièrement le forward-pass
+                cache_key = hashlib.sha256(enhanced_query.encode()).hexdigest()
+                query_embedding = self._query_emb_cache.get(cache_key)
+                if query_embedding is not None:
+                    self._query_emb_cache.move_to_end(cache_key)
+                else:
+                    query_embedding = await self.generate_embedding(enhanced_query)
+                    if query_embedding is None or len(query_embedding) == 0:
+                        logger.error("Impossible de générer l'embedding pour la requête")
+                        return []
+                    self._query_emb_cache[cache_key] = query_embedding
+                    if len(self._query_emb_cache) > _QUERY_EMB_CACHE_MAX:
+                        self._query_emb_cache.popitem(last=False)
             
             # *** RECHERCHE AVEC ISOLATION STRICTE ***
+            # Les deux branches sont indépendantes: elles partent en
+            # parallèle (requête Chroma côté io_executor, scoring BM25 côté
+            # cpu_executor) au lieu de s'additionner séquentiellement
             results = []
-            
+
+            semantic_task = asyncio.ensure_future(self._semantic_search_with_isolation(
+                query_embedding, top_k * 2, isolation_filters, target_person
+            ))
+            # Dérivés de la requête partagés par les branches et le re-ranking
+            query_ctx = self._build_query_context(query) if query else None
+
+            keyword_task = None
+            if enable_hybrid_search and query_ctx is not None:
+                keyword_task = asyncio.ensure_future(self._keyword_search_with_isolation(
+                    query_ctx, target_person, top_k, isolation_filters
+                ))
+
+            branch_results = await asyncio.gather(
+                *(t for t in (semantic_task, keyword_task) if t is not None),
+                return_exceptions=True
+            )
+
             # 1. Recherche sémantique avec filtres d'isolation
-            try:
-                semantic_results = await self._semantic_search_with_isolation(
-                    query_embedding, top_k * 2, isolation_filters
-                )
-                
+            semantic_results = branch_results[0]
+            if isinstance(semantic_results, Exception):
+                logger.warning(f"Erreur recherche sémantique isolée: {semantic_results}")
+            else:
                 for result in semantic_results:
                     result["search_strategy"] = "semantic_isolated"
-                
                 results.extend(semantic_results)
                 logger.info(f"🎯 Recherche sémantique isolée: {len(semantic_results)} résultats")
-                
-            except Exception as e:
-                logger.warning(f"Erreur recherche sémantique isolée: {e}")
-            
+
             # 2. Recherche par mots-clés avec isolation (si activée)
-            if enable_hybrid_search and query:
-                try:
-                    keyword_results = await self._keyword_search_with_isolation(
-                        query, target_person, top_k, isolation_filters
-                    )
-                    
+            if keyword_task is not None:
+                keyword_results = branch_results[1]
+                if isinstance(keyword_results, Exception):
+                    logger.warning(f"Erreur recherche mots-clés isolée: {keyword_results}")
+                else:
                     for result in keyword_results:
                         result["search_strategy"] = "keyword_isolated"
-                    
                     results.extend(keyword_results)
                     logger.info(f"🔤 Recherche mots-clés isolée: {len(keyword_results)} résultats")
-                    
-                except Exception as e:
-                    logger.warning(f"Erreur recherche mots-clés isolée: {e}")
             
             if not results:
                 logger.warning("❌ Aucun résultat avec isolation")
                 return []
             
-            # *** VALIDATION D'ISOLATION POST-RECHERCHE ***
-            validated_results = self._validate_isolation(results, target_person)
-            logger.info(f"✅ Après validation d'isolation: {len(validated_results)} résultats")
-            
+            # L'isolation est déjà appliquée dans chaque branche (filtres
+            # Chroma + vérification au formatage), plus de seconde passe ici
             # *** FUSION ET DÉDUPLICATION AVEC VÉRIFICATION D'ISOLATION ***
-            merged_results = self._merge_and_deduplicate_isolated_results(validated_results)
+            merged_results = self._merge_and_deduplicate_isolated_results(results)
             logger.info(f"🔄 Après fusion isolée: {len(merged_results)} résultats uniques")
             
-            # *** RE-RANKING AVEC BONUS D'ISOLATION ***
+            # *** RE-RANKING : CROSS-ENCODER, HEURISTIQUE EN SECOURS ***
             if enable_reranking and query and merged_results:
-                reranked_results = self._rerank_with_isolation_bonus(query, merged_results, target_person)
-                logger.info(f"📈 Re-ranking avec bonus d'isolation effectué")
+                reranked_results = None
+                try:
+                    loop = asyncio.get_event_loop()
+                    reranked_results = await loop.run_in_executor(
+                        self.executor, self._cross_encoder_rerank, query, merged_results
+                    )
+                    if reranked_results is not None:
+                        logger.info(f"📈 Re-ranking cross-encoder effectué")
+                except Exception as e:
+                    logger.warning(f"Erreur re-ranking cross-encoder: {e}")
+                    reranked_results = None
+
+                if reranked_results is None:
+                    reranked_results = self._rerank_with_isolation_bonus(query_ctx, merged_results, target_person)
+                    logger.info(f"📈 Re-ranking avec bonus d'isolation effectué")
             else:
                 reranked_results = merged_results
             
@@ -814,30 +1549,46 @@ class EmbeddingService:
             logger.error(traceback.format_exc())
             return []
     
+    def _register_person_aliases(self, person_info: Dict[str, Any]) -> None:
+        """Mémoriser le nom normalisé d'une personne sous tous ses alias.
+
+        Alimenté à l'ingestion: le nom complet normalisé plus chacune de
+        ses composantes (prénom, nom) pointent vers le nom stocké, pour
+        que le filtre de recherche reste une égalité exacte ($in).
+        """
+        name_normalized = person_info.get("name_normalized")
+        if not name_normalized:
+            return
+
+        keys = {name_normalized}
+        keys.update(part for part in name_normalized.split('_') if len(part) > 2)
+        for key in keys:
+            self._person_alias_map.setdefault(key, set()).add(name_normalized)
+
     def _build_isolation_filters(self, filter_metadata: Dict[str, Any], target_person: str = None) -> Dict[str, Any]:
         """*** NOUVEAU : Construire les filtres d'isolation ***"""
         filters = {}
-        
+
         # Ajouter les filtres existants
         if filter_metadata:
             filters.update(filter_metadata)
-        
+
         # *** FILTRE STRICTE PAR PERSONNE ***
         if target_person:
             # Normaliser le nom cible
-            target_normalized = re.sub(r'[^a-zA-Z\s]', '', target_person.lower())
-            target_normalized = re.sub(r'\s+', '_', target_normalized.strip())
-            
-            # Utiliser plusieurs stratégies de filtrage
-            filters.update({
-                "$or": [
-                    {"person_name": {"$eq": target_person}},
-                    {"person_name_normalized": {"$eq": target_normalized}},
-                    {"person_name": {"$regex": f".*{target_person.split()[0]}.*"}},  # Prénom
-                    {"isolation_key": {"$regex": f".*{target_normalized}.*"}}
-                ]
-            })
-        
+            target_normalized = _normalize_person_name(target_person)
+
+            # $in sur le nom normalisé plutôt que $or + $regex: Chroma
+            # filtre par égalité (probe de hash) au lieu d'un scan regex
+            # linéaire des métadonnées
+            aliases = {target_normalized}
+            aliases.update(self._person_alias_map.get(target_normalized, ()))
+            for part in target_normalized.split('_'):
+                if len(part) > 2:
+                    aliases.update(self._person_alias_map.get(part, ()))
+
+            filters["person_name_normalized"] = {"$in": sorted(aliases)}
+
         return filters
     
     def _enhance_query_with_person(self, query: str, target_person: str = None) -> str:
@@ -851,110 +1602,327 @@ class EmbeddingService:
         
         return query
     
+    @staticmethod
+    def _where_predicate(filters: Dict[str, Any]):
+        """Traduire une where-clause simple en prédicat Python sur les métadonnées.
+
+        Seuls les cas émis par ce service sont couverts (égalité, $eq,
+        $in au premier niveau); retourne None pour toute clause plus
+        riche, signe qu'il faut déléguer le filtrage à Chroma.
+        """
+        if not filters:
+            return lambda meta: True
+
+        conditions = []
+        for key, cond in filters.items():
+            if key.startswith("$"):
+                return None
+            if isinstance(cond, dict):
+                if set(cond) == {"$eq"}:
+                    conditions.append((key, None, cond["$eq"]))
+                elif set(cond) == {"$in"}:
+                    conditions.append((key, set(cond["$in"]), None))
+                else:
+                    return None
+            else:
+                conditions.append((key, None, cond))
+
+        def predicate(meta: Dict[str, Any]) -> bool:
+            for key, allowed, expected in conditions:
+                value = meta.get(key)
+                if allowed is not None:
+                    if value not in allowed:
+                        return False
+                elif value != expected:
+                    return False
+            return True
+
+        return predicate
+
+    def _semantic_search_in_memory(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        isolation_filters: Dict[str, Any] = None,
+        target_person: str = None
+    ) -> Optional[List[SearchResult]]:
+        """Recherche sémantique sur la matrice en RAM, ou None si impossible"""
+        self._build_bm25_index()
+        if self._corpus_matrix is None:
+            return None
+
+        predicate = self._where_predicate(isolation_filters)
+        if predicate is None:
+            return None
+
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query_vec))
+        if norm > 0.0:
+            query_vec = query_vec / norm
+
+        # Cosinus = produit scalaire (lignes normalisées): un seul GEMV
+        scores = self._corpus_matrix @ query_vec
+
+        if isolation_filters:
+            candidates = np.fromiter(
+                (i for i, meta in enumerate(self._corpus_metas) if predicate(meta)),
+                dtype=np.int64
+            )
+            if candidates.size == 0:
+                return []
+        else:
+            candidates = None
+
+        cand_scores = scores[candidates] if candidates is not None else scores
+        k = min(top_k, cand_scores.shape[0])
+        top = np.argpartition(-cand_scores, k - 1)[:k]
+        top = top[np.argsort(-cand_scores[top])]
+        if candidates is not None:
+            top = candidates[top]
+
+        formatted_results: List[SearchResult] = []
+        for i in top:
+            i = int(i)
+            doc = self._corpus_docs[i]
+            meta = self._corpus_metas[i]
+
+            # Filtre personne au formatage: les rejetés ne sont pas construits
+            if target_person and not self._is_same_person(meta, target_person):
+                continue
+
+            similarity_score = max(0.0, min(1.0, float(scores[i])))
+
+            formatted_results.append({
+                "content": doc,
+                "similarity_score": similarity_score,
+                "distance": 1.0 - float(scores[i]),
+                "document_id": meta.get("document_id"),
+                "source_file": meta.get("source_file", meta.get("filename", "Unknown")),
+                "chunk_index": meta.get("chunk_index", 0),
+                "chunk_type": meta.get("chunk_type", "general"),
+                "section_title": meta.get("section_title", ""),
+                "keywords": meta.get("keywords", ""),
+                "content_preview": doc[:200] + "..." if len(doc) > 200 else doc,
+                "timestamp": meta.get("timestamp"),
+                "metadata": meta,
+                "person_name": meta.get("person_name", ""),
+                "isolation_key": meta.get("isolation_key", ""),
+                "isolation_valid": True
+            })
+
+        return formatted_results
+
     async def _semantic_search_with_isolation(
         self, 
-        query_embedding: List[float], 
+        query_embedding: np.ndarray, 
         top_k: int,
-        isolation_filters: Dict[str, Any] = None
+        isolation_filters: Dict[str, Any] = None,
+        target_person: str = None
     ) -> List[Dict[str, Any]]:
-        """*** NOUVEAU : Recherche sémantique avec isolation ***"""
+        """*** NOUVEAU : Recherche sémantique avec isolation ***
+
+        Pour les petits corpus, un produit matrice-vecteur sur la matrice
+        en RAM (un GEMV BLAS + top-k) court-circuite l'aller-retour HNSW
+        de Chroma; sinon, ou si le filtre n'est pas traduisible, on
+        retombe sur collection.query.
+        """
         try:
-            # Recherche ChromaDB avec filtres d'isolation
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=isolation_filters if isolation_filters else None,
-                include=["documents", "metadatas", "distances"]
+            loop = asyncio.get_event_loop()
+
+            in_memory = await loop.run_in_executor(
+                self.cpu_executor,
+                self._semantic_search_in_memory,
+                query_embedding, top_k, isolation_filters, target_person
+            )
+            if in_memory is not None:
+                return in_memory
+
+            # Recherche ChromaDB avec filtres d'isolation, déportée dans le
+            # pool I/O: le client Chroma est synchrone et la recherche
+            # mots-clés peut ainsi tourner en parallèle
+            results = await loop.run_in_executor(
+                self.io_executor,
+                lambda: self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=top_k,
+                    where=isolation_filters if isolation_filters else None,
+                    include=["documents", "metadatas", "distances"]
+                )
             )
             
             if not results or not results.get("documents") or not results["documents"][0]:
                 return []
             
-            # Formater les résultats
-            return self._format_search_results(results)
+            # Formater les résultats (le filtre personne est appliqué ici,
+            # les candidats rejetés ne sont jamais matérialisés)
+            return self._format_search_results(results, target_person)
             
         except Exception as e:
             logger.error(f"Erreur recherche sémantique avec isolation: {e}")
             return []
     
+    def _invalidate_corpus_indexes(self):
+        """Invalider les index en mémoire après une écriture, puis planifier
+        leur reconstruction en arrière-plan: la première recherche qui suit
+        une ingestion retrouve un index déjà chaud au lieu de payer la
+        relecture complète de la collection."""
+        self._bm25_index = None
+        self._chunk_tokens = {}
+        self._chunk_sigs = {}
+        self._corpus_matrix = None
+        self._stats_cache = None
+        if self.cpu_executor is not None:
+            self.cpu_executor.submit(self._build_bm25_index)
+
+    def _build_bm25_index(self) -> Optional[_BM25Index]:
+        """Construire (ou retourner) les index en mémoire du corpus courant.
+
+        Une seule lecture paginée de la collection alimente à la fois
+        l'index BM25 et la matrice d'embeddings de la recherche sémantique
+        en RAM. Le verrou évite une double construction quand les branches
+        sémantique et mots-clés démarrent en parallèle.
+        """
+        if self._bm25_index is not None:
+            return self._bm25_index
+
+        with self._index_build_lock:
+            if self._bm25_index is not None:
+                return self._bm25_index
+
+            try:
+                keep_embeddings = self.collection.count() <= _IN_MEMORY_CORPUS_MAX
+
+                # Lecture paginée: chaque page est désérialisée puis relâchée,
+                # le pic mémoire reste borné par la page et non par le corpus
+                # (et la collection n'est plus tronquée à une limite arbitraire)
+                page_size = 200
+                docs: List[str] = []
+                metas: List[Dict[str, Any]] = []
+                embeddings: List[Any] = []
+                include = ["documents", "metadatas"]
+                if keep_embeddings:
+                    include.append("embeddings")
+                offset = 0
+
+                while True:
+                    page = self.collection.get(
+                        limit=page_size,
+                        offset=offset,
+                        include=include
+                    )
+                    page_docs = page.get("documents") if page else None
+                    if not page_docs:
+                        break
+                    docs.extend(page_docs)
+                    metas.extend(page["metadatas"])
+                    if keep_embeddings:
+                        embeddings.extend(page["embeddings"])
+                    if len(page_docs) < page_size:
+                        break
+                    offset += page_size
+
+                if not docs:
+                    return None
+
+                if keep_embeddings and embeddings:
+                    matrix = np.asarray(embeddings, dtype=np.float32)
+                    # Re-normaliser par sécurité (les vecteurs d'anciennes
+                    # ingestions peuvent ne pas être unitaires)
+                    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                    np.maximum(norms, 1e-12, out=norms)
+                    matrix /= norms
+                    self._corpus_matrix = matrix
+                    self._corpus_docs = docs
+                    self._corpus_metas = metas
+
+                self._bm25_index = _BM25Index(docs, metas)
+                self._chunk_tokens = {
+                    meta.get("chunk_id", ""): tokens
+                    for meta, tokens in zip(metas, self._bm25_index.token_sets)
+                }
+                self._chunk_sigs = {
+                    meta.get("chunk_id", ""): sig
+                    for meta, sig in zip(metas, self._bm25_index.signatures)
+                }
+                logger.info(f"Index BM25 construit sur {len(docs)} chunks (matrice en RAM: {keep_embeddings})")
+                return self._bm25_index
+            except Exception as e:
+                logger.warning(f"Construction de l'index BM25 échouée: {e}")
+                return None
+
+    def _build_query_context(self, query: str) -> "_QueryContext":
+        """Calculer une seule fois les dérivés de la requête d'une recherche"""
+        query_lower = query.lower()
+        tokens = _BM25_TOKEN_RE.findall(query_lower)
+        words = set(tokens)
+        return _QueryContext(
+            lower=query_lower,
+            tokens=tokens,
+            words=words,
+            signature=_token_signature(words),
+            keywords=set(self._extract_keywords(query_lower)),
+        )
+
     async def _keyword_search_with_isolation(
         self,
-        query: str,
+        query_ctx: "_QueryContext",
         target_person: str,
         top_k: int,
         isolation_filters: Dict[str, Any] = None
     ) -> List[Dict[str, Any]]:
-        """*** NOUVEAU : Recherche par mots-clés avec isolation ***"""
+        """*** Recherche par mots-clés via l'index BM25 en mémoire ***"""
         try:
-            # Extraire les mots-clés de la requête
-            query_keywords = self._extract_keywords(query.lower())
-            query_words = set(query.lower().split())
-            
-            # Récupérer les documents avec filtres d'isolation
-            all_docs = self.collection.get(
-                limit=1000,
-                include=["documents", "metadatas"],
-                where=isolation_filters if isolation_filters else None
-            )
-            
-            if not all_docs or not all_docs.get("documents"):
+            if not query_ctx.tokens:
                 return []
-            
+
+            loop = asyncio.get_event_loop()
+            # La (re)construction tokenise tout le corpus: hors event loop
+            index = await loop.run_in_executor(self.cpu_executor, self._build_bm25_index)
+            if index is None:
+                return []
+
+            # Marge sur top_k: le filtre d'isolation élimine des candidats
+            scored = index.search(query_ctx.tokens, top_k * 3)
+            if not scored:
+                return []
+
+            max_score = scored[0][1]
             keyword_results = []
-            
-            # Analyser chaque document avec vérification d'isolation
-            for i, (doc, meta) in enumerate(zip(all_docs["documents"], all_docs["metadatas"])):
-                # Double vérification d'isolation
+
+            for doc_idx, score in scored:
+                meta = index.metas[doc_idx]
+
+                # Vérification d'isolation sur les candidats retenus
                 if target_person and not self._is_same_person(meta, target_person):
                     continue
-                
-                doc_lower = doc.lower()
-                meta_keywords = meta.get("keywords", "").lower().split(", ")
-                
-                # Calculer score de correspondance mots-clés
-                keyword_matches = 0
-                word_matches = 0
-                
-                # Correspondances dans les mots-clés
-                for kw in query_keywords:
-                    if any(kw in meta_kw for meta_kw in meta_keywords):
-                        keyword_matches += 2
-                    if kw in doc_lower:
-                        keyword_matches += 1
-                
-                # Correspondances dans le contenu
-                for word in query_words:
-                    if len(word) > 2 and word in doc_lower:
-                        word_matches += 1
-                
-                # Score total
-                total_matches = keyword_matches + word_matches
-                if total_matches > 0:
-                    keyword_score = min(1.0, total_matches / (len(query_keywords) + len(query_words)))
-                    
-                    keyword_results.append({
-                        "content": doc,
-                        "similarity_score": keyword_score * 0.8,
-                        "distance": 1 - keyword_score,
-                        "document_id": meta.get("document_id"),
-                        "source_file": meta.get("source_file", meta.get("filename", "Unknown")),
-                        "chunk_index": meta.get("chunk_index", 0),
-                        "chunk_type": meta.get("chunk_type", "general"),
-                        "keywords": meta.get("keywords", ""),
-                        "metadata": meta,
-                        "keyword_matches": keyword_matches,
-                        "word_matches": word_matches,
-                        "isolation_valid": True
-                    })
-            
-            # Trier par score et limiter
-            keyword_results.sort(key=lambda x: x["similarity_score"], reverse=True)
-            return keyword_results[:top_k]
-            
+
+                # Score normalisé sur [0, 0.8] pour rester comparable aux
+                # similarités sémantiques, comme l'ancien scoring manuel
+                keyword_score = 0.8 * score / max_score
+
+                keyword_results.append({
+                    "content": index.docs[doc_idx],
+                    "similarity_score": keyword_score,
+                    "distance": 1 - keyword_score,
+                    "document_id": meta.get("document_id"),
+                    "source_file": meta.get("source_file", meta.get("filename", "Unknown")),
+                    "chunk_index": meta.get("chunk_index", 0),
+                    "chunk_type": meta.get("chunk_type", "general"),
+                    "keywords": meta.get("keywords", ""),
+                    "metadata": meta,
+                    "bm25_score": score,
+                    "isolation_valid": True
+                })
+
+                if len(keyword_results) >= top_k:
+                    break
+
+            return keyword_results
+
         except Exception as e:
             logger.error(f"Erreur recherche mots-clés avec isolation: {e}")
             return []
-    
+
     def _is_same_person(self, metadata: Dict[str, Any], target_person: str) -> bool:
         """*** NOUVEAU : Vérifier si les métadonnées correspondent à la personne cible ***"""
         if not target_person:
@@ -963,22 +1931,25 @@ class EmbeddingService:
         person_name = metadata.get("person_name", "")
         person_name_normalized = metadata.get("person_name_normalized", "")
         
-        # Normaliser le nom cible
-        target_normalized = re.sub(r'[^a-zA-Z\s]', '', target_person.lower())
-        target_normalized = re.sub(r'\s+', '_', target_normalized.strip())
-        
+        # Normaliser le nom cible (mémoïsé: gratuit dès le second candidat)
+        target_normalized = _normalize_person_name(target_person)
+        target_lower = target_person.lower()
+        person_lower = person_name.lower()
+
         # Vérifications multiples
-        checks = [
-            person_name.lower() == target_person.lower(),
-            person_name_normalized == target_normalized,
-            target_person.lower() in person_name.lower(),
-            any(part.lower() in person_name.lower() for part in target_person.split() if len(part) > 2)
-        ]
-        
-        return any(checks)
+        return (
+            person_lower == target_lower or
+            person_name_normalized == target_normalized or
+            target_lower in person_lower or
+            any(part in person_lower for part in target_lower.split() if len(part) > 2)
+        )
     
-    def _validate_isolation(self, results: List[Dict[str, Any]], target_person: str = None) -> List[Dict[str, Any]]:
-        """*** NOUVEAU : Valider l'isolation des résultats ***"""
+    def _validate_isolation(self, results: List[SearchResult], target_person: str = None) -> List[SearchResult]:
+        """*** NOUVEAU : Valider l'isolation des résultats ***
+
+        Conservé comme garde-fou (les branches de recherche filtrent
+        désormais à la source et ne matérialisent plus les rejetés).
+        """
         if not target_person:
             # Marquer tous comme valides si pas de cible spécifique
             for result in results:
@@ -1000,21 +1971,22 @@ class EmbeddingService:
         
         return validated_results
     
-    def _merge_and_deduplicate_isolated_results(self, all_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _merge_and_deduplicate_isolated_results(self, all_results: List[SearchResult]) -> List[SearchResult]:
         """*** NOUVEAU : Fusionner les résultats avec validation d'isolation ***"""
-        # Grouper par identifiant unique (document_id + chunk_index + person)
+        # Grouper par identifiant unique (document_id + chunk_index + person).
+        # Clé tuple plutôt que f-string: pas de formatage par résultat,
+        # le hachage du tuple suffit
         results_map = {}
-        
+
         for result in all_results:
             person_name = result.get("metadata", {}).get("person_name", "unknown")
-            key = f"{result.get('document_id', 'unknown')}_{result.get('chunk_index', 0)}_{person_name}"
-            
-            if key not in results_map:
+            key = (result.get("document_id"), result.get("chunk_index", 0), person_name)
+
+            existing = results_map.get(key)
+            if existing is None:
                 results_map[key] = result
             else:
                 # Fusionner les résultats du même chunk de la même personne
-                existing = results_map[key]
-                
                 # Prendre le meilleur score
                 if result["similarity_score"] > existing["similarity_score"]:
                     existing["similarity_score"] = result["similarity_score"]
@@ -1037,108 +2009,104 @@ class EmbeddingService:
         return merged_results
     
     def _rerank_with_isolation_bonus(
-        self, 
-        query: str, 
-        results: List[Dict[str, Any]], 
+        self,
+        query_ctx: "_QueryContext",
+        results: List[SearchResult],
         target_person: str = None
-    ) -> List[Dict[str, Any]]:
-        """*** NOUVEAU : Re-ranking avec bonus d'isolation ***"""
-        
-        query_lower = query.lower()
-        query_words = set(query_lower.split())
-        query_keywords = set(self._extract_keywords(query_lower))
-        
-        for result in results:
-            content = result.get("content", "").lower()
+    ) -> List[SearchResult]:
+        """*** NOUVEAU : Re-ranking avec bonus d'isolation ***
+
+        Les composantes sont accumulées dans des tableaux NumPy et le score
+        final est une somme pondérée fusionnée + clip vectorisés; seule
+        l'extraction des composantes textuelles reste par résultat.
+        """
+        if not results:
+            return results
+
+        query_words = query_ctx.words
+        query_sig = query_ctx.signature
+        query_keywords = query_ctx.keywords
+        target_lower = target_person.lower() if target_person else None
+
+        n = len(results)
+        base = np.empty(n, dtype=np.float32)
+        word = np.empty(n, dtype=np.float32)
+        keyword = np.empty(n, dtype=np.float32)
+        bonus = np.empty(n, dtype=np.float32)
+
+        for i, result in enumerate(results):
             metadata = result.get("metadata", {})
-            
-            # 1. Score de correspondance textuelle
-            content_words = set(content.split())
-            word_overlap = len(query_words.intersection(content_words))
-            word_score = word_overlap / max(len(query_words), 1)
-            
-            # 2. Score de correspondance mots-clés
-            doc_keywords = set(metadata.get("keywords", "").lower().split(", "))
-            keyword_overlap = len(query_keywords.intersection(doc_keywords))
-            keyword_score = keyword_overlap / max(len(query_keywords), 1) if query_keywords else 0
-            
+
+            # 1. Score de correspondance textuelle: tokens pré-calculés à la
+            # construction de l'index BM25, re-tokenisation seulement pour
+            # les chunks pas encore indexés. Un AND de signatures nul
+            # garantit un recouvrement vide sans intersection de sets
+            chunk_id = metadata.get("chunk_id", "")
+            chunk_sig = self._chunk_sigs.get(chunk_id)
+            if chunk_sig is not None and not (chunk_sig & query_sig):
+                word[i] = 0.0
+            else:
+                content_words = self._chunk_tokens.get(chunk_id)
+                if content_words is None:
+                    content_words = frozenset(_BM25_TOKEN_RE.findall(result.get("content", "").lower()))
+                word[i] = len(query_words & content_words) / max(len(query_words), 1)
+
+            # 2. Score de correspondance mots-clés (stockés déjà en minuscules)
+            doc_keywords = set(metadata.get("keywords", "").split(", "))
+            keyword[i] = (
+                len(query_keywords & doc_keywords) / len(query_keywords)
+                if query_keywords else 0.0
+            )
+
             # 3. Bonus type de chunk
-            chunk_type = metadata.get("chunk_type", "general")
-            type_bonus = {
-                "skills": 0.15,
-                "experience": 0.12,
-                "project": 0.10,
-                "education": 0.08,
-                "certification": 0.08,
-                "general": 0.0
-            }.get(chunk_type, 0.0)
-            
-            # 4. *** NOUVEAU : Bonus d'isolation stricte ***
+            extra = _RERANK_TYPE_BONUS.get(metadata.get("chunk_type", "general"), 0.0)
+
+            # 4. *** Bonus d'isolation stricte ***
             isolation_bonus = 0.0
-            if target_person:
-                person_name = metadata.get("person_name", "")
-                if person_name and target_person.lower() in person_name.lower():
+            if target_lower:
+                person_lower = metadata.get("person_name", "").lower()
+                if person_lower and target_lower in person_lower:
                     isolation_bonus = 0.20  # Bonus important pour la bonne personne
-                
-                # Bonus supplémentaire si correspondance exacte
-                if person_name.lower() == target_person.lower():
-                    isolation_bonus += 0.10
-            
+                if person_lower == target_lower:
+                    isolation_bonus += 0.10  # Correspondance exacte
+            extra += isolation_bonus
+
             # 5. Bonus multi-stratégie
-            multi_strategy_bonus = 0.05 if result.get("multi_strategy", False) else 0.0
-            
+            if result.get("multi_strategy", False):
+                extra += 0.05
+
             # 6. Bonus section title
             section_title = metadata.get("section_title", "").lower()
-            section_bonus = 0.0
-            for word in query_words:
-                if word in section_title:
-                    section_bonus += 0.03
-            
+            for w in query_words:
+                if w in section_title:
+                    extra += 0.03
+
             # 7. Pénalité pour chunks très courts
             content_length = len(result.get("content", ""))
-            length_penalty = 0.0
             if content_length < 100:
-                length_penalty = -0.05
+                extra -= 0.05
             elif content_length < 50:
-                length_penalty = -0.10
-            
-            # *** CALCUL DU SCORE FINAL AVEC ISOLATION ***
-            base_score = result["similarity_score"]
-            
-            final_score = (
-                base_score * 0.50 +                    # 50% embedding similarity (réduit)
-                word_score * 0.15 +                    # 15% word overlap
-                keyword_score * 0.10 +                 # 10% keyword overlap
-                isolation_bonus +                      # 20-30% bonus d'isolation (NOUVEAU)
-                type_bonus +                           # Type bonus
-                multi_strategy_bonus +                 # Multi-strategy bonus
-                section_bonus +                        # Section relevance bonus
-                length_penalty                         # Length penalty
-            )
-            
-            # S'assurer que le score reste dans [0, 1]
-            final_score = max(0.0, min(1.0, final_score))
-            
-            # Stocker les scores détaillés
-            result["final_score"] = final_score
-            result["scoring_details"] = {
-                "base_score": base_score,
-                "word_score": word_score,
-                "keyword_score": keyword_score,
-                "isolation_bonus": isolation_bonus,  # NOUVEAU
-                "type_bonus": type_bonus,
-                "multi_strategy_bonus": multi_strategy_bonus,
-                "section_bonus": section_bonus,
-                "length_penalty": length_penalty
-            }
-        
-        # Trier par score final
-        results.sort(key=lambda x: x.get("final_score", x["similarity_score"]), reverse=True)
-        
-        return results
-    
-    def _format_search_results(self, results: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Formater les résultats de recherche avec isolation"""
+                extra -= 0.10
+
+            base[i] = result["similarity_score"]
+            bonus[i] = extra
+
+        # *** CALCUL DU SCORE FINAL : somme pondérée fusionnée + clip ***
+        final = np.clip(base * 0.50 + word * 0.15 + keyword * 0.10 + bonus, 0.0, 1.0)
+
+        for i, result in enumerate(results):
+            result["final_score"] = float(final[i])
+
+        # Trier par score final (ordre NumPy, pas de lambda par comparaison)
+        order = np.argsort(-final, kind="stable")
+        return [results[int(i)] for i in order]
+
+    def _format_search_results(self, results: Dict[str, Any], target_person: str = None) -> List[SearchResult]:
+        """Formater les résultats de recherche avec isolation.
+
+        Le filtre personne est appliqué avant de construire chaque dict:
+        un candidat d'une autre personne est écarté sans être matérialisé.
+        """
         formatted_results = []
         
         if not results or not results.get("documents"):
@@ -1149,6 +2117,10 @@ class EmbeddingService:
         distances = results["distances"][0]
         
         for doc, meta, distance in zip(documents, metadatas, distances):
+            if target_person and not self._is_same_person(meta, target_person):
+                logger.debug(f"❌ Résultat filtré - Personne: {meta.get('person_name', 'INCONNU')} vs Cible: {target_person}")
+                continue
+
             # Meilleure conversion distance -> similarité
             similarity_score = max(0.0, min(1.0, 1.0 - distance))
             
@@ -1162,11 +2134,14 @@ class EmbeddingService:
                 "chunk_type": meta.get("chunk_type", "general"),
                 "section_title": meta.get("section_title", ""),
                 "keywords": meta.get("keywords", ""),
-                "content_preview": meta.get("content_preview", doc[:200] + "..." if len(doc) > 200 else doc),
+                # Aperçu dérivé du document retourné par la requête (le champ
+                # n'est plus dupliqué dans les métadonnées stockées)
+                "content_preview": doc[:200] + "..." if len(doc) > 200 else doc,
                 "timestamp": meta.get("timestamp"),
                 "metadata": meta,
                 "person_name": meta.get("person_name", ""),  # NOUVEAU
-                "isolation_key": meta.get("isolation_key", "")  # NOUVEAU
+                "isolation_key": meta.get("isolation_key", ""),  # NOUVEAU
+                "isolation_valid": True
             })
         
         return formatted_results
@@ -1174,13 +2149,20 @@ class EmbeddingService:
     async def get_collection_stats(self) -> Dict[str, Any]:
         """Statistiques de la collection avec informations d'isolation"""
         try:
+            # Cache TTL: les statistiques échantillonnent jusqu'à 100
+            # documents, inutile de les recalculer à chaque appel
+            if self._stats_cache is not None:
+                cached_at, cached_stats = self._stats_cache
+                if time.monotonic() - cached_at < _STATS_TTL_SECONDS:
+                    return cached_stats
+
             count = self.collection.count()
             
             # Récupérer des échantillons et stats détaillées
             sample_docs = []
             unique_docs = set()
             unique_persons = set()
-            chunk_types = {}
+            chunk_types: Dict[str, int] = {}
             
             if count > 0:
                 try:
@@ -1188,37 +2170,37 @@ class EmbeddingService:
                         limit=min(100, count), 
                         include=["documents", "metadatas"]
                     )
-                    
-                    for doc, meta in zip(sample_results["documents"], sample_results["metadatas"]):
-                        doc_id = meta.get("document_id")
-                        person_name = meta.get("person_name", "")
-                        chunk_type = meta.get("chunk_type", "general")
-                        
-                        unique_docs.add(doc_id)
-                        if person_name:
-                            unique_persons.add(person_name)
-                        
-                        # Compter les types de chunks
-                        chunk_types[chunk_type] = chunk_types.get(chunk_type, 0) + 1
-                        
-                        # Échantillons pour debug
-                        if len(sample_docs) < 5:
-                            sample_docs.append({
-                                "document_id": doc_id,
-                                "person_name": person_name,
-                                "chunk_index": meta.get("chunk_index"),
-                                "chunk_type": chunk_type,
-                                "section_title": meta.get("section_title", ""),
-                                "content_preview": doc[:150] + "..." if len(doc) > 150 else doc,
-                                "timestamp": meta.get("timestamp"),
-                                "keywords_count": len(meta.get("keywords", "").split(", ")) if meta.get("keywords") else 0,
-                                "isolation_key": meta.get("isolation_key", "")
-                            })
+                    metadatas = sample_results["metadatas"]
+
+                    # Agrégations en une compréhension chacune (C-speed)
+                    # plutôt qu'une boucle Python champ par champ
+                    unique_docs = {meta.get("document_id") for meta in metadatas}
+                    unique_persons = {
+                        person for meta in metadatas
+                        if (person := meta.get("person_name", ""))
+                    }
+                    chunk_types = dict(Counter(
+                        meta.get("chunk_type", "general") for meta in metadatas
+                    ))
+
+                    # Échantillons pour debug
+                    for doc, meta in zip(sample_results["documents"][:5], metadatas[:5]):
+                        sample_docs.append({
+                            "document_id": meta.get("document_id"),
+                            "person_name": meta.get("person_name", ""),
+                            "chunk_index": meta.get("chunk_index"),
+                            "chunk_type": meta.get("chunk_type", "general"),
+                            "section_title": meta.get("section_title", ""),
+                            "content_preview": doc[:150] + "..." if len(doc) > 150 else doc,
+                            "timestamp": meta.get("timestamp"),
+                            "keywords_count": len(meta.get("keywords", "").split(", ")) if meta.get("keywords") else 0,
+                            "isolation_key": meta.get("isolation_key", "")
+                        })
                             
                 except Exception as e:
                     logger.warning(f"Erreur récupération échantillons: {e}")
             
-            return {
+            stats = {
                 "total_chunks": count,
                 "unique_documents": len(unique_docs),
                 "unique_persons": len(unique_persons),  # NOUVEAU
@@ -1232,7 +2214,10 @@ class EmbeddingService:
                 "avg_chunks_per_document": round(count / len(unique_docs), 1) if unique_docs else 0,
                 "avg_chunks_per_person": round(count / len(unique_persons), 1) if unique_persons else 0  # NOUVEAU
             }
-            
+
+            self._stats_cache = (time.monotonic(), stats)
+            return stats
+
         except Exception as e:
             logger.error(f"Erreur stats: {e}")
             return {
@@ -1241,4 +2226,36 @@ class EmbeddingService:
                 "unique_documents": 0,
                 "unique_persons": 0,
                 "collection_name": settings.CHROMADB_COLLECTION_NAME
-            }
\ No newline at end of file
+            }
+
+# Instance partagée au niveau du process: l'index BM25, la matrice
+# d'embeddings du corpus, le batcher et le cross-encoder survivent ainsi
+# d'une requête HTTP à l'autre au lieu d'être reconstruits à chaque appel
+_service_lock = asyncio.Lock()
+_service_instance: Optional[EmbeddingService] = None
+
+
+async def get_embedding_service() -> EmbeddingService:
+    """Obtenir l'instance partagée du service, initialisée à la demande"""
+    global _service_instance
+
+    # Chemin rapide sans verrou une fois l'instance prête
+    instance = _service_instance
+    if instance is not None and instance._initialized:
+        return instance
+
+    async with _service_lock:
+        if _service_instance is None:
+            _service_instance = EmbeddingService()
+        if not _service_instance._initialized:
+            await _service_instance.initialize()
+        return _service_instance
+
+
+async def cleanup_embedding_service():
+    """Fermer l'instance partagée (hook shutdown FastAPI)"""
+    global _service_instance
+    async with _service_lock:
+        if _service_instance is not None:
+            await _service_instance.cleanup()
+            _service_instance = None
@@ -1,16 +1,148 @@
 import asyncio
 import aiohttp
+import hashlib
 import json
 import logging
-from typing import Dict, Any, AsyncGenerator, Optional, List
+import random
+import re
+from collections import OrderedDict
+from typing import Dict, Any, AsyncGenerator, NamedTuple, Optional, List, Tuple
 from datetime import datetime
 import time
 from dataclasses import dataclass
 
 from core.config import settings
 
+# orjson (C) décode les petits deltas SSE nettement plus vite que le json
+# stdlib; repli transparent si le paquet n'est pas installé
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
 logger = logging.getLogger(__name__)
 
+# Framing SSE au niveau octets (évite decode/strip/startswith par ligne)
+_SSE_DATA_PREFIX = b"data: "
+_SSE_DATA_PREFIX_LEN = len(_SSE_DATA_PREFIX)
+_SSE_DONE = b"[DONE]"
+# La spécification SSE autorise les fins de ligne LF et CRLF: les deux
+# délimiteurs d'événement doivent être reconnus
+_SSE_EVENT_SEP = b"\n\n"
+_SSE_EVENT_SEP_CRLF = b"\r\n\r\n"
+
+
+def _split_sse_event(buffer: bytearray) -> Optional[bytes]:
+    """Détacher le prochain événement complet du tampon SSE.
+
+    Coupe au premier délimiteur rencontré, LF ou CRLF; retourne None si
+    aucun événement complet n'est encore arrivé.
+    """
+    sep_lf = buffer.find(_SSE_EVENT_SEP)
+    sep_crlf = buffer.find(_SSE_EVENT_SEP_CRLF)
+    if sep_crlf >= 0 and (sep_lf < 0 or sep_crlf < sep_lf):
+        event = bytes(buffer[:sep_crlf])
+        del buffer[:sep_crlf + len(_SSE_EVENT_SEP_CRLF)]
+        return event
+    if sep_lf >= 0:
+        event = bytes(buffer[:sep_lf])
+        del buffer[:sep_lf + len(_SSE_EVENT_SEP)]
+        return event
+    return None
+
+
+def _parse_sse_event(event: bytes) -> Tuple[List[str], bool]:
+    """Extraire les deltas de contenu d'un événement SSE.
+
+    Seules les lignes data: sont décodées (commentaires et autres champs
+    ignorés). Retourne (contenus, fin de stream).
+    """
+    contents: List[str] = []
+    for line in event.split(b"\n"):
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        if not line.startswith(_SSE_DATA_PREFIX):
+            continue
+        payload = line[_SSE_DATA_PREFIX_LEN:]  # Enlever 'data:'
+
+        # Fin du stream
+        if payload == _SSE_DONE:
+            return contents, True
+
+        try:
+            data = _json_loads(payload)
+        except ValueError:
+            continue
+
+        # Extraire le contenu
+        if "choices" in data and len(data["choices"]) > 0:
+            choice = data["choices"][0]
+            if "delta" in choice and "content" in choice["delta"]:
+                content = choice["delta"]["content"]
+                if content:
+                    contents.append(content)
+    return contents, False
+
+# Coalescence du streaming: regrouper les deltas avant de les propager
+# (chaque yield devient un send ASGI chez l'appelant)
+_STREAM_FLUSH_BYTES = 64
+_STREAM_FLUSH_INTERVAL = 0.02  # secondes
+
+# Cache de réponses pour les appels quasi-déterministes (température très
+# basse): même prompt => même sortie, inutile de repayer l'aller-retour
+_RESPONSE_CACHE_MAX = 512
+_RESPONSE_CACHE_TTL = 300.0  # secondes
+_RESPONSE_CACHE_TEMP_MAX = 0.1
+
+# Durée de validité de la liste des modèles OpenRouter
+_MODELS_CACHE_TTL = 600.0  # secondes
+
+# Anti-rafale sur les sondes de santé (liveness Kubernetes, montées de pods)
+_HEALTH_CACHE_TTL = 5.0  # secondes
+
+# Découpage des réponses groupées de generate_batch ("1) ...", "2) ...")
+_BATCH_ANSWER_RE = re.compile(r"(?m)^\s*(\d+)\)\s*")
+
+
+# Statuts HTTP temporaires: un retry a une chance d'aboutir (les autres 4xx
+# sont des erreurs permanentes, réessayer ne fait que brûler des appels)
+_RETRYABLE_STATUSES = frozenset({408, 409, 425, 429})
+
+
+class StreamEvent(NamedTuple):
+    """Événement typé du stream de génération.
+
+    Sépare les tokens du modèle des erreurs: l'aval n'a plus à deviner si
+    un fragment de texte est de la sortie modèle ou un message d'erreur
+    injecté dans le flux.
+    """
+    kind: str  # "token" ou "error"
+    data: str
+
+
+@dataclass
+class RetryPolicy:
+    """Paramètres de backoff exponentiel avec jitter et plafond"""
+    max_retries: int = 3
+    base: float = 1.0
+    cap: float = 30.0
+    jitter: float = 0.5
+
+    def delay(self, attempt: int) -> float:
+        """Délai avant la tentative suivante (exponentiel, jitteré, plafonné).
+
+        Le jitter désynchronise les clients qui partagent une même limite
+        de débit et évite les vagues de retries simultanés.
+        """
+        return min(self.base * (2 ** attempt) * (1.0 + random.random() * self.jitter), self.cap)
+
 
 @dataclass
 class OpenRouterResponse:
@@ -29,6 +161,43 @@ class OpenRouterService:
         self.config = settings.get_openrouter_config()
         self.session: Optional[aiohttp.ClientSession] = None
         self._initialized = False
+        self.retry_policy = RetryPolicy(max_retries=self.config['max_retries'])
+
+        # URLs amont formatées une seule fois
+        self._url_chat = f"{self.config['base_url']}/chat/completions"
+        self._url_models = f"{self.config['base_url']}/models"
+
+        # Cache TTL (LRU) des réponses à température quasi nulle
+        self._response_cache: OrderedDict = OrderedDict()
+
+        # Contrôle d'admission: compteur sous Condition plutôt que
+        # Semaphore, pour pouvoir redimensionner la limite à chaud
+        # (réduite de moitié sur 429, restaurée après une série de succès)
+        self._admission = asyncio.Condition()
+        self._inflight = 0
+        self._c_max_limit = getattr(settings, 'OPENROUTER_MAX_CONCURRENCY', 20)
+        self._c_max = self._c_max_limit
+        self._consecutive_ok = 0
+
+        # Dernier résultat de health check (débounce des sondes liveness)
+        self._health_cache: Optional[Dict[str, Any]] = None
+        self._health_cache_at = 0.0
+        self._health_etag: Optional[str] = None
+
+        # Liste des modèles, rafraîchie au plus toutes les 10 minutes
+        self._models_cache: List[Dict[str, Any]] = []
+        self._models_by_id: Dict[str, Dict[str, Any]] = {}
+        self._models_cache_at = 0.0
+
+        # Squelette de payload partagé par toutes les requêtes: les clés
+        # fixes (modèle, defaults d'échantillonnage) ne sont construites
+        # qu'une fois, chaque appel ne fait qu'un dict-spread par-dessus
+        self._payload_template = {
+            "model": self.config['model'],
+            "max_tokens": self.config['max_tokens'],
+            "temperature": self.config['temperature'],
+            "top_p": self.config['top_p'],
+        }
         
         # Headers pour les requêtes
         self.headers = {
@@ -41,18 +210,44 @@ class OpenRouterService:
     async def initialize(self):
         """Initialiser le service OpenRouter"""
         try:
-            # Créer la session HTTP
+            # Créer la session HTTP. On reste sur aiohttp (HTTP/1.1 +
+            # keep-alive): httpx en mode HTTP/2 permettrait de multiplexer
+            # les requêtes sur une connexion unique, mais ajouterait une
+            # dépendance et une seconde pile HTTP pour un service dont la
+            # concurrence amont reste faible; le pool keep-alive ci-dessous
+            # amortit déjà les handshakes TLS entre requêtes
             timeout = aiohttp.ClientTimeout(total=self.config['timeout'])
-            connector = aiohttp.TCPConnector(limit=100, limit_per_host=20)
+            # Sockets TLS gardés au chaud (le handshake est le coût
+            # dominant par requête HTTPS), nettoyage des fd SSL fermés et
+            # cache DNS long: l'amont est un hôte unique et stable
+            connector = aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=20,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True,
+                use_dns_cache=True,
+                ttl_dns_cache=600,
+                force_close=False
+            )
             
             self.session = aiohttp.ClientSession(
                 timeout=timeout,
                 connector=connector,
-                headers=self.headers
+                headers=self.headers,
+                # OpenRouter ne pose pas de cookies; le jar par défaut
+                # accumule inutilement sur une session longue durée
+                cookie_jar=aiohttp.DummyCookieJar()
             )
             
-            # Tester la connexion
-            await self.health_check()
+            # Tester la connexion et préchauffer la liste des modèles en
+            # parallèle: un seul RTT au démarrage au lieu de deux en série
+            health, _ = await asyncio.gather(
+                self.health_check(),
+                self.get_available_models(),
+                return_exceptions=True
+            )
+            if isinstance(health, Exception):
+                raise health
             
             self._initialized = True
             logger.info(f"OpenRouter Service initialisé avec le modèle: {self.config['model']}")
@@ -69,7 +264,13 @@ class OpenRouterService:
         logger.info("OpenRouter Service nettoyé")
     
     async def health_check(self) -> Dict[str, Any]:
-        """Vérifier la santé du service OpenRouter"""
+        """Vérifier la santé du service OpenRouter.
+
+        Sonde GET /models: valide l'authentification et la joignabilité
+        sans payer de complétion (l'ancienne sonde consommait des tokens
+        à chaque passage de liveness). Le dernier résultat sain est servi
+        pendant 5s pour amortir les rafales de sondes.
+        """
         try:
             if not self.session:
                 return {
@@ -78,31 +279,34 @@ class OpenRouterService:
                     "timestamp": datetime.utcnow().isoformat()
                 }
             
-            # Test simple avec un prompt minimal
-            test_response = await self._make_request(
-                messages=[
-                    {"role": "system", "content": "Tu es un assistant test."},
-                    {"role": "user", "content": "Dis juste 'OK' pour confirmer que tu fonctionnes."}
-                ],
-                max_tokens=10,
-                temperature=0.1
-            )
+            if (
+                self._health_cache is not None
+                and time.monotonic() - self._health_cache_at < _HEALTH_CACHE_TTL
+            ):
+                return self._health_cache
             
-            if test_response.content.strip():
-                return {
-                    "status": "healthy",
+            headers = {"If-None-Match": self._health_etag} if self._health_etag else None
+            async with self.session.get(
+                self._url_models, headers=headers
+            ) as response:
+                # 304: la liste n'a pas changé, l'API répond => sain
+                healthy = response.status in (200, 304)
+                etag = response.headers.get("ETag")
+                if etag:
+                    self._health_etag = etag
+                
+                result = {
+                    "status": "healthy" if healthy else "unhealthy",
                     "model": self.config['model'],
                     "base_url": self.config['base_url'],
-                    "test_response": test_response.content[:50] + "..." if len(test_response.content) > 50 else test_response.content,
-                    "usage": test_response.usage,
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-            else:
-                return {
-                    "status": "degraded",
-                    "error": "Réponse vide du modèle",
                     "timestamp": datetime.utcnow().isoformat()
                 }
+                if not healthy:
+                    result["error"] = f"HTTP {response.status}"
+                
+                self._health_cache = result
+                self._health_cache_at = time.monotonic()
+                return result
                 
         except Exception as e:
             logger.error(f"Erreur health check OpenRouter: {str(e)}")
@@ -132,27 +336,101 @@ class OpenRouterService:
             
             messages.append({"role": "user", "content": prompt})
             
+            # Cache TTL pour les appels quasi-déterministes (health check,
+            # prompts de récupération répétés): clé blake2b courte, LRU borné
+            effective_temp = temperature if temperature is not None else self.config['temperature']
+            cache_key = None
+            if effective_temp <= _RESPONSE_CACHE_TEMP_MAX:
+                cache_key = hashlib.blake2b(
+                    f"{system_prompt}\x00{prompt}\x00{max_tokens}\x00{effective_temp}".encode(),
+                    digest_size=16
+                ).digest()
+                cached = self._response_cache.get(cache_key)
+                if cached is not None:
+                    expires_at, content = cached
+                    if time.monotonic() < expires_at:
+                        self._response_cache.move_to_end(cache_key)
+                        return content
+                    del self._response_cache[cache_key]
+            
             # Générer la réponse
+            # Les defaults sont appliqués dans _make_request via le
+            # squelette de payload: plus de re-lecture du dict de config ici
             response = await self._make_request(
                 messages=messages,
-                max_tokens=max_tokens or self.config['max_tokens'],
-                temperature=temperature or self.config['temperature']
+                max_tokens=max_tokens,
+                temperature=temperature
             )
             
+            if cache_key is not None:
+                self._response_cache[cache_key] = (time.monotonic() + _RESPONSE_CACHE_TTL, response.content)
+                if len(self._response_cache) > _RESPONSE_CACHE_MAX:
+                    self._response_cache.popitem(last=False)
+            
             return response.content
             
         except Exception as e:
             logger.error(f"Erreur génération réponse OpenRouter: {str(e)}")
             raise
     
+    async def generate_batch(
+        self,
+        prompts: List[str],
+        system_prompt: str = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None
+    ) -> List[str]:
+        """Répondre à plusieurs prompts indépendants en un seul appel.
+
+        Les prompts sont numérotés puis envoyés dans une même complétion,
+        et la réponse est redécoupée sur les numéros: un seul aller-retour
+        au lieu de N pour des mini-appels séquentiels. À réserver aux
+        températures basses (le modèle doit respecter la numérotation);
+        si le redécoupage échoue, chaque prompt repart individuellement.
+        """
+        if not prompts:
+            return []
+        if len(prompts) == 1:
+            return [await self.generate_response(prompts[0], system_prompt, max_tokens, temperature)]
+
+        combined = "\n\n".join(f"{i}) {p}" for i, p in enumerate(prompts, 1))
+        instruction = (
+            "Réponds séparément à chacune des questions numérotées ci-dessous. "
+            "Commence chaque réponse sur une nouvelle ligne par son numéro suivi "
+            "d'une parenthèse, exactement comme dans les questions (1), 2), ...)."
+        )
+        content = await self.generate_response(
+            f"{instruction}\n\n{combined}", system_prompt, max_tokens, temperature
+        )
+
+        answers = [""] * len(prompts)
+        parts = _BATCH_ANSWER_RE.split(content)
+        # parts = [préambule, num, texte, num, texte, ...]
+        pairs = iter(parts[1:])
+        for num, text in zip(pairs, pairs):
+            idx = int(num) - 1
+            if 0 <= idx < len(prompts) and not answers[idx]:
+                answers[idx] = text.strip()
+
+        # Numérotation non respectée: retomber sur un appel par prompt
+        if not all(answers):
+            logger.warning("generate_batch: redécoupage incomplet, repli en appels individuels")
+            for i, answer in enumerate(answers):
+                if not answer:
+                    answers[i] = await self.generate_response(
+                        prompts[i], system_prompt, max_tokens, temperature
+                    )
+
+        return answers
+
     async def generate_response_stream(
         self,
         prompt: str,
         system_prompt: str = None,
         max_tokens: Optional[int] = None,
         temperature: Optional[float] = None
-    ) -> AsyncGenerator[str, None]:
-        """Générer une réponse en streaming"""
+    ) -> AsyncGenerator[StreamEvent, None]:
+        """Générer une réponse en streaming (événements typés)"""
         try:
             if not self._initialized or not self.session:
                 raise RuntimeError("Service OpenRouter non initialisé")
@@ -165,17 +443,34 @@ class OpenRouterService:
             
             messages.append({"role": "user", "content": prompt})
             
-            # Générer en streaming
+            # Générer en streaming, en coalesçant les deltas: un flush
+            # tous les ~64 octets ou ~20 ms au lieu d'un yield par token,
+            # ce qui divise les context-switches aval sans latence perçue
+            buf: List[str] = []
+            buf_len = 0
+            last_flush = time.monotonic()
+
             async for chunk in self._make_request_stream(
                 messages=messages,
-                max_tokens=max_tokens or self.config['max_tokens'],
-                temperature=temperature or self.config['temperature']
+                max_tokens=max_tokens,
+                temperature=temperature
             ):
-                yield chunk
+                buf.append(chunk)
+                buf_len += len(chunk)
+                now = time.monotonic()
+                if buf_len >= _STREAM_FLUSH_BYTES or now - last_flush >= _STREAM_FLUSH_INTERVAL:
+                    yield StreamEvent("token", "".join(buf))
+                    buf.clear()
+                    buf_len = 0
+                    last_flush = now
+
+            # Reliquat en fin de stream
+            if buf:
+                yield StreamEvent("token", "".join(buf))
                 
         except Exception as e:
             logger.error(f"Erreur génération streaming OpenRouter: {str(e)}")
-            yield f"Erreur: {str(e)}"
+            yield StreamEvent("error", str(e))
     
     async def _make_request(
         self,
@@ -185,67 +480,142 @@ class OpenRouterService:
         top_p: float = None
     ) -> OpenRouterResponse:
         """Effectuer une requête vers OpenRouter"""
-        url = f"{self.config['base_url']}/chat/completions"
+        url = self._url_chat
         
-        payload = {
-            "model": self.config['model'],
-            "messages": messages,
-            "max_tokens": max_tokens or self.config['max_tokens'],
-            "temperature": temperature or self.config['temperature'],
-            "top_p": top_p or self.config['top_p'],
-            "stream": False
-        }
+        # "is not None" et non "or": un appelant doit pouvoir passer
+        # légitimement 0 (max_tokens) ou 0.0 (température greedy)
+        payload = {**self._payload_template, "messages": messages, "stream": False}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if top_p is not None:
+            payload["top_p"] = top_p
+        body = _json_dumps(payload)
         
+        policy = self.retry_policy
+        # Slot d'admission tenu pour toute la durée des tentatives
+        await self._acquire_slot()
+        try:
+            return await self._make_request_attempts(url, body, policy)
+        finally:
+            await self._release_slot()
+
+    async def _make_request_attempts(
+        self,
+        url: str,
+        body: bytes,
+        policy: RetryPolicy
+    ) -> OpenRouterResponse:
+        """Boucle de tentatives de _make_request (slot d'admission déjà pris)"""
+        default_model = self._payload_template["model"]
         retries = 0
-        while retries <= self.config['max_retries']:
+        while retries <= policy.max_retries:
             try:
-                async with self.session.post(url, json=payload) as response:
+                async with self.session.post(url, data=body) as response:
                     if response.status == 200:
                         data = await response.json()
                         
-                        # Extraire le contenu
-                        content = ""
-                        if "choices" in data and len(data["choices"]) > 0:
+                        # Extraction EAFP en un seul accès: le chemin nominal
+                        # (réponse bien formée) ne paie aucun test préalable
+                        try:
                             choice = data["choices"][0]
-                            if "message" in choice and "content" in choice["message"]:
-                                content = choice["message"]["content"]
+                            content = choice["message"]["content"]
+                            finish_reason = choice.get("finish_reason")
+                        except (KeyError, IndexError, TypeError):
+                            content, finish_reason = "", None
                         
+                        await self._note_success()
                         return OpenRouterResponse(
                             content=content,
-                            model=data.get("model", self.config['model']),
+                            model=data.get("model", default_model),
                             usage=data.get("usage"),
-                            finish_reason=data.get("choices", [{}])[0].get("finish_reason"),
+                            finish_reason=finish_reason,
                             created=data.get("created")
                         )
                     
-                    elif response.status == 429:  # Rate limit
-                        wait_time = 2 ** retries
-                        logger.warning(f"Rate limit atteint, attente de {wait_time}s...")
+                    elif self._is_retryable_status(response.status):
+                        wait_time = policy.delay(retries)
+                        if response.status == 429:
+                            await self._note_rate_limited()
+                            # Respecter le Retry-After du serveur s'il est fourni
+                            retry_after = response.headers.get("Retry-After")
+                            if retry_after:
+                                try:
+                                    wait_time = min(float(retry_after), policy.cap)
+                                except ValueError:
+                                    pass
+                        logger.warning(f"Erreur temporaire {response.status}, attente de {wait_time:.1f}s...")
                         await asyncio.sleep(wait_time)
                         retries += 1
                         continue
                     
                     else:
+                        # 4xx permanent: réessayer ne changera rien
                         error_text = await response.text()
                         logger.error(f"Erreur OpenRouter {response.status}: {error_text}")
                         raise aiohttp.ClientError(f"HTTP {response.status}: {error_text}")
                         
-            except asyncio.TimeoutError:
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
                 retries += 1
-                if retries > self.config['max_retries']:
+                if retries > policy.max_retries:
                     raise
-                logger.warning(f"Timeout, retry {retries}/{self.config['max_retries']}")
-                await asyncio.sleep(1)
+                wait_time = policy.delay(retries)
+                logger.warning(f"Erreur réseau ({type(e).__name__}), retry {retries}/{policy.max_retries} dans {wait_time:.1f}s")
+                await asyncio.sleep(wait_time)
+            
+            except aiohttp.ClientError:
+                # Erreur permanente levée ci-dessus: remonter telle quelle
+                raise
             
             except Exception as e:
-                if retries >= self.config['max_retries']:
+                if retries >= policy.max_retries:
                     raise
                 retries += 1
-                logger.warning(f"Erreur requête, retry {retries}/{self.config['max_retries']}: {str(e)}")
-                await asyncio.sleep(1)
+                wait_time = policy.delay(retries)
+                logger.warning(f"Erreur requête, retry {retries}/{policy.max_retries}: {str(e)}")
+                await asyncio.sleep(wait_time)
         
-        raise Exception(f"Échec après {self.config['max_retries']} tentatives")
+        raise Exception(f"Échec après {policy.max_retries} tentatives")
     
+    async def _acquire_slot(self):
+        """Attendre un slot d'admission avant d'appeler l'amont"""
+        async with self._admission:
+            await self._admission.wait_for(lambda: self._inflight < self._c_max)
+            self._inflight += 1
+
+    async def _release_slot(self):
+        """Libérer un slot et réveiller un appelant en attente"""
+        async with self._admission:
+            self._inflight -= 1
+            self._admission.notify(1)
+
+    async def _note_rate_limited(self):
+        """Réduire la concurrence de moitié après un 429"""
+        async with self._admission:
+            self._consecutive_ok = 0
+            new_max = max(1, self._c_max // 2)
+            if new_max < self._c_max:
+                logger.warning(f"429 amont: concurrence réduite {self._c_max} -> {new_max}")
+                self._c_max = new_max
+
+    async def _note_success(self):
+        """Restaurer progressivement la concurrence après des succès soutenus"""
+        if self._c_max >= self._c_max_limit:
+            return
+        async with self._admission:
+            self._consecutive_ok += 1
+            if self._consecutive_ok >= 20:
+                self._c_max = min(self._c_max_limit, self._c_max * 2)
+                self._consecutive_ok = 0
+                logger.info(f"Concurrence amont restaurée à {self._c_max}")
+                self._admission.notify_all()
+
+    @staticmethod
+    def _is_retryable_status(status: int) -> bool:
+        """Classifier un statut HTTP: temporaire (retry) ou permanent"""
+        return status >= 500 or status in _RETRYABLE_STATUSES
+
     async def _make_request_stream(
         self,
         messages: List[Dict[str, str]],
@@ -254,63 +624,86 @@ class OpenRouterService:
         top_p: float = None
     ) -> AsyncGenerator[str, None]:
         """Effectuer une requête streaming vers OpenRouter"""
-        url = f"{self.config['base_url']}/chat/completions"
+        url = self._url_chat
         
-        payload = {
-            "model": self.config['model'],
-            "messages": messages,
-            "max_tokens": max_tokens or self.config['max_tokens'],
-            "temperature": temperature or self.config['temperature'],
-            "top_p": top_p or self.config['top_p'],
-            "stream": True
-        }
+        # "is not None" et non "or": un appelant doit pouvoir passer
+        # légitimement 0 (max_tokens) ou 0.0 (température greedy)
+        payload = {**self._payload_template, "messages": messages, "stream": True}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if top_p is not None:
+            payload["top_p"] = top_p
         
+        # Le slot est tenu pendant tout le stream: la génération amont
+        # occupe réellement une capacité jusqu'au dernier token
+        await self._acquire_slot()
         try:
-            async with self.session.post(url, json=payload) as response:
+            # Timeout de lecture par socket plutôt que timeout global: une
+            # longue génération est légitime, un amont muet 60s ne l'est pas
+            stream_timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+            async with self.session.post(
+                url, data=_json_dumps(payload), timeout=stream_timeout
+            ) as response:
                 if response.status != 200:
+                    if response.status == 429:
+                        await self._note_rate_limited()
                     error_text = await response.text()
                     raise aiohttp.ClientError(f"HTTP {response.status}: {error_text}")
                 
-                # Lire le stream
-                async for line in response.content:
-                    line = line.decode('utf-8').strip()
-                    
-                    # Ignorer les lignes vides et les commentaires
-                    if not line or line.startswith(':'):
-                        continue
-                    
-                    # Parser les lignes SSE
-                    if line.startswith('data: '):
-                        data_str = line[6:]  # Enlever 'data: '
-                        
-                        # Fin du stream
-                        if data_str == '[DONE]':
-                            break
-                        
-                        try:
-                            data = json.loads(data_str)
-                            
-                            # Extraire le contenu
-                            if "choices" in data and len(data["choices"]) > 0:
-                                choice = data["choices"][0]
-                                if "delta" in choice and "content" in choice["delta"]:
-                                    content = choice["delta"]["content"]
-                                    if content:
-                                        yield content
-                        
-                        except json.JSONDecodeError:
-                            continue
+                # Lire le stream: framing SSE en octets dans un tampon
+                # unique; seul le payload JSON de chaque événement est
+                # décodé, au lieu de decode+strip+startswith par ligne.
+                # Le framing par bytearray.find plutôt que
+                # StreamReader.readuntil(b"\n\n"): même coût (un appel par
+                # événement), mais sans le plafond de 64 Ko du reader ni la
+                # gestion de LimitOverrunError/IncompleteReadError
+                try:
+                    buffer = bytearray()
+                    async for chunk in response.content.iter_any():
+                        buffer += chunk
+
+                        while True:
+                            event = _split_sse_event(buffer)
+                            if event is None:
+                                break
+                            contents, done = _parse_sse_event(event)
+                            for content in contents:
+                                yield content
+                            if done:
+                                return
+
+                    # Amont terminé sans [DONE]: un dernier événement sans
+                    # délimiteur final peut rester dans le tampon, le
+                    # traiter au lieu de le perdre silencieusement
+                    if buffer:
+                        contents, _ = _parse_sse_event(bytes(buffer))
+                        for content in contents:
+                            yield content
+                except (asyncio.CancelledError, GeneratorExit):
+                    # Client déconnecté (ou tâche annulée) en plein stream:
+                    # fermer la connexion immédiatement au lieu de laisser
+                    # l'async-with drainer le reste de la génération amont
+                    response.close()
+                    raise
         
         except Exception as e:
+            # Remonter l'erreur au lieu de l'injecter comme texte dans le
+            # flux de tokens; generate_response_stream la typifie
             logger.error(f"Erreur streaming OpenRouter: {str(e)}")
-            yield f"Erreur streaming: {str(e)}"
+            raise
+        finally:
+            await self._release_slot()
     
     async def get_available_models(self) -> List[Dict[str, Any]]:
         """Obtenir la liste des modèles disponibles sur OpenRouter"""
         try:
-            url = f"{self.config['base_url']}/models"
+            # Liste déjà rafraîchie récemment: pas de nouvel aller-retour
+            if self._models_cache and time.monotonic() - self._models_cache_at < _MODELS_CACHE_TTL:
+                return self._models_cache
             
-            async with self.session.get(url) as response:
+            async with self.session.get(self._url_models) as response:
                 if response.status == 200:
                     data = await response.json()
                     
@@ -320,6 +713,10 @@ class OpenRouterService:
                         if "deepseek" in model.get("id", "").lower()
                     ]
                     
+                    self._models_cache = deepseek_models
+                    # Index par id: get_model_info en O(1) au lieu d'un scan
+                    self._models_by_id = {m.get("id"): m for m in deepseek_models}
+                    self._models_cache_at = time.monotonic()
                     return deepseek_models
                 else:
                     logger.error(f"Erreur récupération modèles: {response.status}")
@@ -334,18 +731,19 @@ class OpenRouterService:
         target_model = model_id or self.config['model']
         
         try:
-            models = await self.get_available_models()
+            # S'assurer que l'index est peuplé (rafraîchi sous TTL)
+            await self.get_available_models()
             
-            for model in models:
-                if model.get("id") == target_model:
-                    return {
-                        "id": model.get("id"),
-                        "name": model.get("name", ""),
-                        "description": model.get("description", ""),
-                        "context_length": model.get("context_length", 0),
-                        "pricing": model.get("pricing", {}),
-                        "top_provider": model.get("top_provider", {}),
-                    }
+            model = self._models_by_id.get(target_model)
+            if model is not None:
+                return {
+                    "id": model.get("id"),
+                    "name": model.get("name", ""),
+                    "description": model.get("description", ""),
+                    "context_length": model.get("context_length", 0),
+                    "pricing": model.get("pricing", {}),
+                    "top_provider": model.get("top_provider", {}),
+                }
             
             return {"error": f"Modèle {target_model} non trouvé"}
             
@@ -360,4 +758,37 @@ class OpenRouterService:
             "base_url": self.config['base_url'],
             "initialized": self._initialized,
             "session_active": self.session is not None and not self.session.closed
-        }
\ No newline at end of file
+        }
+
+
+# Singleton de module: une seule ClientSession (pool de connexions, cache
+# DNS) pour tout le process, même quand plusieurs RAGService sont créés
+# au fil des requêtes
+_service_lock = asyncio.Lock()
+_service_instance: Optional[OpenRouterService] = None
+
+
+async def get_openrouter_service() -> OpenRouterService:
+    """Obtenir l'instance partagée du service, initialisée à la demande"""
+    global _service_instance
+
+    # Chemin rapide sans verrou une fois l'instance prête
+    instance = _service_instance
+    if instance is not None and instance._initialized:
+        return instance
+
+    async with _service_lock:
+        if _service_instance is None:
+            _service_instance = OpenRouterService()
+        if not _service_instance._initialized:
+            await _service_instance.initialize()
+        return _service_instance
+
+
+async def cleanup_openrouter_service():
+    """Fermer l'instance partagée (hook shutdown FastAPI)"""
+    global _service_instance
+    async with _service_lock:
+        if _service_instance is not None:
+            await _service_instance.cleanup()
+            _service_instance = None
\ No newline at end of file
@@ -1,13 +1,15 @@
 from typing import List, Dict, Any, Optional, AsyncGenerator, TYPE_CHECKING
+from collections import OrderedDict
 from datetime import datetime
 import asyncio
 import logging
 import re
+import time
 
 from sqlalchemy.orm import Session
 
 from core.config import settings
-from services.openrouter_service import OpenRouterService
+from services.openrouter_service import OpenRouterService, get_openrouter_service
 from utils.text_processing import TextProcessor
 
 # Import conditionnel pour éviter les références circulaires
@@ -16,22 +18,85 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Patterns d'extraction directe et de nettoyage compilés une fois au
+# chargement du module (une dizaine de re.* par requête sinon)
+_PHONE_RES = [re.compile(p) for p in (
+    r'0[567]\d{8}',   # Numéros marocains
+    r'\d{10}',        # 10 chiffres
+    r'\+212\d{9}',    # Format international Maroc
+)]
+_AMOUNT_RES = [re.compile(p, re.IGNORECASE) for p in (
+    r'\d+[,.]?\d*\s*(?:DH|MAD|€|EUR)',
+    r'\d+[,.]?\d*\s*(?:dirhams?|euros?)',
+)]
+_REF_RES = [
+    re.compile(r'[A-Z]-\d{4}-\d{7}'),  # Format F-0825-0986083
+    re.compile(r'[A-Z]{1,2}\d{4,}'),    # Références alphanumériques
+]
+_AMOUNT_CTX_RE = re.compile(r'\d+[,.]?\d*\s*(?:DH|MAD)')
+
+# Tournures à supprimer des réponses générées (_clean_response)
+_CLEAN_RES = [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in (
+    r'(?:Document \d+[^:]*:?\s*)',
+    r'(?:Source[^:]*:?\s*)',
+    r'(?:Dans le[^,]*,?\s*)',
+    r'(?:Selon le[^,]*,?\s*)',
+    r'(?:D\'après[^,]*,?\s*)',
+    r'(?:CONCLUSION\s*:?\s*)',
+    r'(?:### [^#\n]*\n)',
+    r'(?:\*\*[^*]*\*\*\s*:?\s*)',
+    r'(?:Cependant[^.]*\.)',
+    r'(?:Cette information[^.]*\.)',
+)]
+_MULTI_NEWLINE_RE = re.compile(r'\n\s*\n')
+_MULTI_WS_RE = re.compile(r'\s+')
+
+# Corrections orthographiques: une seule alternation (clés les plus longues
+# d'abord, le moteur re prenant la première branche qui matche) appliquée en
+# un passage sur la requête, au lieu d'un str.replace par entrée
+_CORRECTIONS = {
+    'certifecation': 'certification',
+    'certifecations': 'certifications',
+    'mustapha': 'Mustapha',
+    'idabella': 'Idabella',
+    'ces': 'ses',
+    'donner moi': 'donne moi',
+    'donné moi': 'donne moi',
+    'generer': 'générer',
+    'numero': 'numéro',
+    'ligne': 'ligne téléphone numéro',
+    'payment': 'paiement facture',
+    'orange': 'Orange opérateur télécom',
+}
+_CORRECTION_RE = re.compile(
+    r'\b(' + '|'.join(sorted(map(re.escape, _CORRECTIONS), key=len, reverse=True)) + r')\b'
+)
+
+# Détection d'intention en un .search au lieu de any(mot in texte)
+_INTENT_PHONE_RE = re.compile(r'numéro|ligne|téléphone')
+_INTENT_BILLING_RE = re.compile(r'paiement|facture|orange')
+
+# Cache des résultats de récupération: une même question reposée dans les
+# minutes qui suivent évite le forward-pass d'embedding ET la recherche
+# vectorielle (le TTL borne la fraîcheur après une nouvelle indexation)
+_RETRIEVAL_CACHE_MAX = 512
+_RETRIEVAL_CACHE_TTL = 300.0  # secondes
+
 
 class RAGService:    
     def __init__(self, embedding_service: Optional["EmbeddingService"] = None):
-        # Ne pas créer un nouveau service si un est déjà fourni
-        if embedding_service is None:
-            from services.embedding_service import EmbeddingService
-            self.embedding_service = EmbeddingService()
-            self._owns_embedding_service = True
-        else:
-            self.embedding_service = embedding_service
-            self._owns_embedding_service = False
+        # Ne pas créer un nouveau service si un est déjà fourni; sinon
+        # l'instance partagée du process sera liée dans initialize()
+        self.embedding_service: Optional["EmbeddingService"] = embedding_service
         
-        # Utilisation d'OpenRouter au lieu d'Ollama
-        self.openrouter_service = OpenRouterService()
+        # Utilisation d'OpenRouter au lieu d'Ollama (instance partagée,
+        # liée dans initialize())
+        self.openrouter_service: Optional[OpenRouterService] = None
         self.text_processor = TextProcessor()
         
+        # Cache TTL (LRU) des documents récupérés, clé (requête, top_k)
+        self._retrieval_cache: OrderedDict = OrderedDict()
+        
         # Configuration RAG - SEUILS RÉDUITS
         self.similarity_threshold = getattr(settings, 'RAG_SIMILARITY_THRESHOLD', 0.1)
         self.fallback_threshold = 0.05
@@ -47,12 +112,15 @@ class RAGService:
     async def initialize(self):
         """Initialiser les services RAG"""
         try:
-            # Initialiser l'embedding service seulement si on le possède
-            if self._owns_embedding_service:
-                await self.embedding_service.initialize()
-            
-            # Initialiser OpenRouter
-            await self.openrouter_service.initialize()
+            # Lier l'instance d'embeddings partagée si aucune n'a été
+            # fournie (jamais nettoyée ici: le shutdown FastAPI s'en charge)
+            if self.embedding_service is None:
+                from services.embedding_service import get_embedding_service
+                self.embedding_service = await get_embedding_service()
+
+            # Récupérer l'instance OpenRouter partagée (une seule session
+            # HTTP pour tout le process, même avec plusieurs RAGService)
+            self.openrouter_service = await get_openrouter_service()
             
             logger.info("RAG Service initialisé avec OpenRouter/DeepSeek")
             
@@ -63,11 +131,11 @@ class RAGService:
     async def cleanup(self):
         """Nettoyer les ressources"""
         try:
-            if self._owns_embedding_service:
-                await self.embedding_service.cleanup()
-            
-            await self.openrouter_service.cleanup()
-            
+            # Les instances d'embeddings et OpenRouter sont partagées: leur
+            # fermeture est gérée par cleanup_embedding_service() et
+            # cleanup_openrouter_service() au shutdown de l'application
+            pass
+
         except Exception as e:
             logger.warning(f"Erreur cleanup services: {e}")
         
@@ -75,31 +143,16 @@ class RAGService:
 
     def _preprocess_query_enhanced(self, query: str) -> str:
         """Préprocessing amélioré avec détection d'intention spécifique"""
-        # Corrections orthographiques communes
-        corrections = {
-            'certifecation': 'certification',
-            'certifecations': 'certifications',
-            'mustapha': 'Mustapha',
-            'idabella': 'Idabella',
-            'ces': 'ses',
-            'donner moi': 'donne moi',
-            'donné moi': 'donne moi',
-            'generer': 'générer',
-            'numero': 'numéro',
-            'ligne': 'ligne téléphone numéro',
-            'payment': 'paiement facture',
-            'orange': 'Orange opérateur télécom'
-        }
-        
-        processed = query.lower()
-        for wrong, correct in corrections.items():
-            processed = processed.replace(wrong, correct)
+        # Corrections orthographiques communes, en une passe
+        processed = _CORRECTION_RE.sub(
+            lambda m: _CORRECTIONS[m.group(0)], query.lower()
+        )
         
         # Détection d'intentions spécifiques pour améliorer la recherche
-        if any(word in processed for word in ['numéro', 'ligne', 'téléphone']):
+        if _INTENT_PHONE_RE.search(processed):
             processed += ' téléphone portable mobile contact'
         
-        if any(word in processed for word in ['paiement', 'facture', 'orange']):
+        if _INTENT_BILLING_RE.search(processed):
             processed += ' facture montant prix abonnement'
         
         logger.info(f"🔧 Query preprocessing: '{query}' -> '{processed}'")
@@ -111,14 +164,8 @@ class RAGService:
         
         # Recherche de numéro de téléphone
         if any(word in query_lower for word in ['numéro', 'ligne', 'téléphone']):
-            phone_patterns = [
-                r'0[567]\d{8}',  # Numéros marocains
-                r'\d{10}',       # 10 chiffres
-                r'\+212\d{9}'    # Format international Maroc
-            ]
-            
-            for pattern in phone_patterns:
-                matches = re.findall(pattern, context)
+            for pattern in _PHONE_RES:
+                matches = pattern.findall(context)
                 if matches:
                     # Chercher des informations contextuelles
                     context_info = ""
@@ -128,7 +175,7 @@ class RAGService:
                         context_info += " dans un fichier de paiement"
                     
                     # Chercher le montant associé
-                    amount_match = re.search(r'\d+[,.]?\d*\s*(?:DH|MAD)', context)
+                    amount_match = _AMOUNT_CTX_RE.search(context)
                     if amount_match:
                         context_info += f" d'un montant de {amount_match.group()}"
                     
@@ -136,13 +183,8 @@ class RAGService:
         
         # Recherche de montant
         if any(word in query_lower for word in ['montant', 'prix', 'coût']):
-            amount_patterns = [
-                r'\d+[,.]?\d*\s*(?:DH|MAD|€|EUR)',
-                r'\d+[,.]?\d*\s*(?:dirhams?|euros?)'
-            ]
-            
-            for pattern in amount_patterns:
-                matches = re.findall(pattern, context, re.IGNORECASE)
+            for pattern in _AMOUNT_RES:
+                matches = pattern.findall(context)
                 if matches:
                     context_info = ""
                     if 'paiement' in context.lower():
@@ -154,13 +196,8 @@ class RAGService:
         
         # Recherche de référence
         if any(word in query_lower for word in ['référence', 'ref']):
-            ref_patterns = [
-                r'[A-Z]-\d{4}-\d{7}',  # Format F-0825-0986083
-                r'[A-Z]{1,2}\d{4,}',   # Références alphanumériques
-            ]
-            
-            for pattern in ref_patterns:
-                matches = re.findall(pattern, context)
+            for pattern in _REF_RES:
+                matches = pattern.findall(context)
                 if matches:
                     context_info = ""
                     if 'paiement' in context.lower():
@@ -187,6 +224,11 @@ class RAGService:
             processed_query = self._preprocess_query_enhanced(query)
             logger.info(f"Requête préprocessée: '{processed_query}'")
             
+            # Lancer la sonde OpenRouter en parallèle de la récupération:
+            # les deux allers-retours réseau se recouvrent au lieu de
+            # s'additionner (le résultat n'est consommé que plus bas)
+            health_task = asyncio.create_task(self.openrouter_service.health_check())
+            
             # Récupérer les documents pertinents
             relevant_docs = await self._retrieve_relevant_documents(
                 processed_query, 
@@ -222,8 +264,10 @@ class RAGService:
                 conversation_history
             )
             
-            # Vérifier que OpenRouter est disponible
-            openrouter_health = await self.openrouter_service.health_check()
+            # Vérifier que OpenRouter est disponible (sonde partie plus haut;
+            # health_check n'a pas de chemin d'exception, un await tardif —
+            # voire jamais atteint sur le chemin d'extraction directe — est sûr)
+            openrouter_health = await health_task
             if openrouter_health.get("status") != "healthy":
                 logger.error("OpenRouter service non disponible")
                 return {
@@ -273,26 +317,13 @@ class RAGService:
     def _clean_response(self, response: str) -> str:
         """Nettoyer la réponse pour la rendre plus directe"""
         # Supprimer les mentions de documents et sources
-        patterns_to_remove = [
-            r'(?:Document \d+[^:]*:?\s*)',
-            r'(?:Source[^:]*:?\s*)',
-            r'(?:Dans le[^,]*,?\s*)',
-            r'(?:Selon le[^,]*,?\s*)',
-            r'(?:D\'après[^,]*,?\s*)',
-            r'(?:CONCLUSION\s*:?\s*)',
-            r'(?:### [^#\n]*\n)',
-            r'(?:\*\*[^*]*\*\*\s*:?\s*)',
-            r'(?:Cependant[^.]*\.)',
-            r'(?:Cette information[^.]*\.)',
-        ]
-        
         cleaned = response
-        for pattern in patterns_to_remove:
-            cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE | re.MULTILINE)
+        for pattern in _CLEAN_RES:
+            cleaned = pattern.sub('', cleaned)
         
         # Nettoyer les espaces multiples et les sauts de ligne
-        cleaned = re.sub(r'\n\s*\n', '\n', cleaned)
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = _MULTI_NEWLINE_RE.sub('\n', cleaned)
+        cleaned = _MULTI_WS_RE.sub(' ', cleaned)
         cleaned = cleaned.strip()
         
         # Si la réponse est trop courte après nettoyage, retourner l'originale
@@ -392,10 +423,15 @@ RÉPONSE CLAIRE AVEC EXPLICATION:"""
             
             # Stream la réponse avec nettoyage
             accumulated_content = ""
-            async for chunk in self.openrouter_service.generate_response_stream(
+            async for event in self.openrouter_service.generate_response_stream(
                 prompt=prompt,
                 system_prompt=self.system_prompt
             ):
+                # Événement typé: une erreur amont n'est plus mélangée aux
+                # tokens, elle bascule sur le yield d'erreur ci-dessous
+                if event.kind == "error":
+                    raise RuntimeError(event.data)
+                chunk = event.data
                 accumulated_content += chunk
                 # Nettoyer le contenu accumulé périodiquement
                 if len(accumulated_content) > 100:
@@ -435,6 +471,18 @@ RÉPONSE CLAIRE AVEC EXPLICATION:"""
     ) -> List[Dict[str, Any]]:
         """Récupérer les documents pertinents avec debugging simplifié"""
         try:
+            # Cache TTL sur la requête préprocessée: un hit court-circuite
+            # l'embedding de la requête et la recherche vectorielle
+            cache_key = (query, top_k)
+            cached = self._retrieval_cache.get(cache_key)
+            if cached is not None:
+                cached_at, cached_docs = cached
+                if time.monotonic() - cached_at < _RETRIEVAL_CACHE_TTL:
+                    self._retrieval_cache.move_to_end(cache_key)
+                    logger.info(f"🔍 Recherche pour: '{query}' (cache)")
+                    return cached_docs
+                del self._retrieval_cache[cache_key]
+            
             logger.info(f"🔍 Recherche pour: '{query}'")
             
             results = await self.embedding_service.search_similar_documents(
@@ -501,6 +549,11 @@ RÉPONSE CLAIRE AVEC EXPLICATION:"""
                     relevant_docs.append(doc_data)
             
             logger.info(f"🎯 Documents sélectionnés: {len(relevant_docs)}")
+            
+            self._retrieval_cache[cache_key] = (time.monotonic(), relevant_docs)
+            if len(self._retrieval_cache) > _RETRIEVAL_CACHE_MAX:
+                self._retrieval_cache.popitem(last=False)
+            
             return relevant_docs
             
         except Exception as e:
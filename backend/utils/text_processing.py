@@ -5,8 +5,18 @@ from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+# Patterns de clean_text compilés une fois (évite le passage par le cache
+# interne de re à chaque appel)
+_WS_RE = re.compile(r'\s+')
+_SPECIAL_RE = re.compile(r'[^\w\s\.\!\?\,\;\:\-\(\)]')
+_DOTS_RE = re.compile(r'\.{2,}')
+_EXCL_RE = re.compile(r'\!{2,}')
+_QUEST_RE = re.compile(r'\?{2,}')
+# Variante pour clean_many: préserve le séparateur \x00 utilisé pour joindre
+_SPECIAL_KEEP_SEP_RE = re.compile(r'[^\w\s\.\!\?\,\;\:\-\(\)\x00]')
 
-class TextProcessor:    
+
+class TextProcessor:
     def __init__(self):
         self.stop_words_fr = {
             'le', 'de', 'et', 'à', 'un', 'il', 'être', 'et', 'en', 'avoir', 'que', 'pour',
@@ -29,16 +39,39 @@ class TextProcessor:
             return ""
         
         text = text.strip()
-        
+
         if aggressive:
-            text = re.sub(r'\s+', ' ', text)
-            text = re.sub(r'[^\w\s\.\!\?\,\;\:\-\(\)]', '', text)
-            text = re.sub(r'\.{2,}', '.', text)
-            text = re.sub(r'\!{2,}', '!', text)
-            text = re.sub(r'\?{2,}', '?', text)
-        
+            text = _WS_RE.sub(' ', text)
+            text = _SPECIAL_RE.sub('', text)
+            text = _DOTS_RE.sub('.', text)
+            text = _EXCL_RE.sub('!', text)
+            text = _QUEST_RE.sub('?', text)
+
         return text.strip()
 
+    def clean_many(self, texts: List[str], aggressive: bool = True) -> List[str]:
+        """Nettoyer une liste de textes en une seule passe regex.
+
+        Les textes sont joints par un séparateur \\x00 (absent des textes
+        après nettoyage), chaque re.sub n'est payé qu'une fois sur le bloc
+        entier, puis le bloc est redécoupé dans l'ordre d'origine.
+        """
+        if not texts:
+            return []
+
+        joined = "\x00".join(
+            t.replace("\x00", " ") if isinstance(t, str) else "" for t in texts
+        )
+
+        if aggressive:
+            joined = _WS_RE.sub(' ', joined)
+            joined = _SPECIAL_KEEP_SEP_RE.sub('', joined)
+            joined = _DOTS_RE.sub('.', joined)
+            joined = _EXCL_RE.sub('!', joined)
+            joined = _QUEST_RE.sub('?', joined)
+
+        return [piece.strip() for piece in joined.split("\x00")]
+
     @lru_cache(maxsize=1000)
     def detect_language(self, text: str) -> Optional[str]:
         if not text or len(text.strip()) < 10: